@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+
+def _cache_files(directory):
+    if not os.path.isdir(directory):
+        return {}
+    return {name: os.stat(os.path.join(directory, name)).st_mtime_ns
+            for name in os.listdir(directory)}
+
+
+@pytest.fixture(autouse=True, scope='session')
+def temporary_cache():
+    """Кэш во временном каталоге (core.testing.temporary_cache): pytest не
+    запускает TEST_RUNNER, а тесты не должны читать и очищать кэш
+    запущенного сервера."""
+    from django.conf import settings
+    from core.testing import temporary_cache
+
+    directories = {os.path.dirname(params['LOCATION'])
+                   for params in settings.CACHES.values()}
+    before = {directory: _cache_files(directory) for directory in directories}
+    with temporary_cache():
+        yield
+    after = {directory: _cache_files(directory) for directory in directories}
+    assert after == before, (
+        'Тесты изменили файлы настоящего кэша из settings.CACHES'
+    )
@@ -0,0 +1,116 @@
+"""Пользователь запроса из кэша вместо базы.
+
+AuthenticationMiddleware Django на каждом запросе вошедшего пользователя
+читает его строку из базы. CachedAuthenticationMiddleware берёт из общего
+кэша поля пользователя, нужные страницам (CACHED_FIELDS), и собирает из
+них экземпляр User с отложенными остальными полями, а сессия
+(SESSION_ENGINE cached_db) читается из того же кэша. Хэш пароля в кэш не
+попадает: вместо него хранится готовый get_session_auth_hash(), и сессия
+сверяется с ним так же, как в django.contrib.auth.get_user, поэтому смена
+пароля по-прежнему завершает остальные сессии.
+
+Запись сбрасывается при сохранении и удалении пользователя (смена пароля,
+last_login при входе, правки в админке) и при выходе. QuerySet.update()
+сигналов не шлёт — такие правки видны по истечении USER_CACHE_TIMEOUT.
+Другие процессы видят сброс не позже SYNC_INTERVAL кэша (core.cache).
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+# Поля пользователя, которые читают страницы; остальные (password,
+# last_login, email) загрузятся из базы при первом обращении.
+CACHED_FIELDS = ('username', 'first_name', 'last_name', 'is_active',
+                 'is_staff', 'is_superuser')
+
+
+def user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def _attnames():
+    opts = auth.get_user_model()._meta
+    return [opts.pk.attname, *(field.attname
+                               for field in opts.concrete_fields
+                               if field.name in CACHED_FIELDS)]
+
+
+def _record(user):
+    return {'fields': {name: getattr(user, name) for name in _attnames()},
+            'session_hash': user.get_session_auth_hash()}
+
+
+def _restore(record):
+    """Пользователь и хэш сессии из записи кэша или None, если набор
+    полей изменился."""
+    attnames = _attnames()
+    try:
+        values = [record['fields'][name] for name in attnames]
+    except (KeyError, TypeError):
+        return None
+    if len(record['fields']) != len(attnames):
+        return None
+    user = auth.get_user_model().from_db(DEFAULT_DB_ALIAS, attnames, values)
+    return user, record['session_hash']
+
+
+def get_user(request):
+    """Как django.contrib.auth.get_user, но пользователь — из кэша."""
+    session = request.session
+    try:
+        user_id = auth.get_user_model()._meta.pk.to_python(
+            session[auth.SESSION_KEY])
+        backend_path = session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    key = user_key(user_id)
+    record = cache.get(key)
+    cached = record and _restore(record)
+    if not cached:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache.set(key, _record(user), settings.USER_CACHE_TIMEOUT)
+        return user
+    user, user_hash = cached
+    user.backend = backend_path
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(session_hash,
+                                                   user_hash)):
+        session.flush()
+        return AnonymousUser()
+    return user
+
+
+def _cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_user(request)
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _cached_user(request))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_user(sender, instance, **kwargs):
+    cache.delete(user_key(instance.pk))
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        cache.delete(user_key(user.pk))
@@ -0,0 +1,401 @@
+"""Двухуровневый кэш: L1 в памяти процесса и общий L2 в файле SQLite.
+
+Чтение идёт сначала в L1 (ограниченный LRU, общий для потоков процесса),
+при промахе — в L2, который видят все процессы на машине. Каждая запись
+в L2 добавляет ключ в журнал инвалидаций; процесс не реже раза в
+SYNC_INTERVAL секунд читает новые записи журнала и выбрасывает эти ключи
+из своего L1. Поэтому L1 другого процесса отстаёт от L2 не дольше
+SYNC_INTERVAL, а собственные записи процесса видны сразу.
+
+Счётчики попаданий копятся в процессе и при синхронизации добавляются в
+общую таблицу статистики (команда cache_stats).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+    'value BLOB NOT NULL, expires REAL)',
+    # key IS NULL — очистка всего кэша.
+    'CREATE TABLE IF NOT EXISTS invalidations (seq INTEGER PRIMARY KEY '
+    'AUTOINCREMENT, key TEXT, origin TEXT NOT NULL, created REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, '
+    'value INTEGER NOT NULL)',
+)
+STATS = ('l1_hits', 'l2_hits', 'misses', 'writes', 'invalidations')
+
+
+class LocalStore:
+    """L1 процесса: LRU с ограничением числа ключей и позиция в журнале."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (pickled value, expires)
+        self.lock = threading.Lock()
+        # Отличает записи журнала этого процесса от чужих.
+        self.origin = uuid.uuid4().hex
+        self.last_seq = None
+        self.synced_at = float('-inf')
+        # Растёт при каждой инвалидации: значение, прочитанное из L2
+        # до неё, в L1 уже не кладётся.
+        self.generation = 0
+        self.stats = Counter()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, expires, generation=None):
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def evict(self, keys):
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_local_store(location, max_entries):
+    # В ключе pid: после fork у рабочего процесса должен быть свой L1.
+    name = (location, os.getpid())
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = LocalStore(max_entries)
+        return _stores[name]
+
+
+class TieredCache(BaseCache):
+    """Бэкенд кэша Django: L1 в памяти процесса поверх общего L2 в SQLite.
+
+    OPTIONS: MAX_ENTRIES и CULL_FREQUENCY относятся к L2, L1_MAX_ENTRIES —
+    к L1, SYNC_INTERVAL — как часто (в секундах) читать журнал
+    инвалидаций, JOURNAL_TTL — сколько секунд хранить его записи.
+    """
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        params = {**params, 'OPTIONS': {'MAX_ENTRIES': 10000, **options}}
+        super().__init__(params)
+        self.location = location
+        self.sync_interval = float(options.get('SYNC_INTERVAL', 1.0))
+        self.journal_ttl = float(options.get('JOURNAL_TTL', 300))
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._pid = os.getpid()
+        self._l1 = get_local_store(location, self._l1_max_entries)
+        self._connection = None
+        self._writes = 0
+
+    def _check_fork(self):
+        # После fork (gunicorn --preload, нагрузочный стенд) процессу нужны
+        # свой L1 и своё соединение: родительские делить нельзя.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._l1 = get_local_store(self.location, self._l1_max_entries)
+            self._connection = None
+
+    @property
+    def _store(self):
+        self._check_fork()
+        return self._l1
+
+    # L2 и журнал
+
+    @property
+    def db(self):
+        # Django создаёт свой экземпляр бэкенда на поток, так что
+        # соединение SQLite не делится между потоками.
+        self._check_fork()
+        if self._connection is None:
+            directory = os.path.dirname(self.location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.location, timeout=30,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._connection = connection
+            if self._store.last_seq is None:
+                self._sync(force=True)
+        return self._connection
+
+    def _write(self, statements, keys):
+        """Выполняет изменения L2 и пишет keys в журнал одной транзакцией.
+
+        statements — функция, получающая курсор; её результат
+        возвращается. keys=None означает очистку всего кэша.
+        """
+        db = self.db
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = statements(db)
+            changed = [None] if keys is None else keys
+            db.executemany(
+                'INSERT INTO invalidations (key, origin, created) '
+                'VALUES (?, ?, ?)',
+                [(key, self._store.origin, now) for key in changed])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._store.stats['writes'] += 1
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._cull(now)
+        return result
+
+    def _cull(self, now):
+        db = self.db
+        db.execute('DELETE FROM cache WHERE expires <= ?', [now])
+        db.execute('DELETE FROM invalidations WHERE created < ?',
+                   [now - self.journal_ttl])
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            # Самые давние записи: INSERT OR REPLACE выдаёт новый rowid.
+            excess = (count - self._max_entries
+                      + self._max_entries // self._cull_frequency)
+            db.execute('DELETE FROM cache WHERE rowid IN (SELECT rowid '
+                       'FROM cache ORDER BY rowid LIMIT ?)', [excess])
+
+    def _sync(self, force=False):
+        store = self._store
+        now = time.monotonic()
+        if not force and now - store.synced_at < self.sync_interval:
+            return
+        store.synced_at = now
+        db = self.db
+        max_seq = db.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'invalidations'"
+        ).fetchone()
+        max_seq = max_seq[0] if max_seq else 0
+        last_seq = store.last_seq
+        store.last_seq = max_seq
+        if last_seq is None or last_seq == max_seq:
+            self._flush_stats()
+            return
+        rows = db.execute(
+            'SELECT key, origin FROM invalidations WHERE seq > ? '
+            'AND seq <= ?', [last_seq, max_seq]).fetchall()
+        # Записи журнала устарели и удалены — что именно менялось,
+        # уже не узнать, поэтому L1 сбрасывается целиком.
+        if len(rows) != max_seq - last_seq or any(
+                key is None for key, origin in rows
+                if origin != store.origin):
+            store.clear()
+        else:
+            keys = {key for key, origin in rows if origin != store.origin}
+            if keys:
+                store.evict(keys)
+                store.stats['invalidations'] += len(keys)
+        self._flush_stats()
+
+    def _flush_stats(self):
+        store = self._store
+        with store.lock:
+            deltas, store.stats = store.stats, Counter()
+        if deltas:
+            self.db.executemany(
+                'INSERT INTO stats (name, value) VALUES (?, ?) '
+                'ON CONFLICT(name) DO UPDATE '
+                'SET value = value + excluded.value',
+                list(deltas.items()))
+
+    def stats(self):
+        """Суммарная статистика всех процессов с учётом этого."""
+        self._sync(force=True)
+        totals = dict.fromkeys(STATS, 0)
+        totals.update(self.db.execute('SELECT name, value FROM stats'))
+        lookups = totals['l1_hits'] + totals['l2_hits'] + totals['misses']
+        totals['hit_ratio'] = ((totals['l1_hits'] + totals['l2_hits'])
+                               / lookups if lookups else 0.0)
+        totals['l2_entries'] = self.db.execute(
+            'SELECT COUNT(*) FROM cache').fetchone()[0]
+        totals['l1_entries'] = len(self._store.entries)
+        return totals
+
+    # API кэша Django
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _lookup(self, keys):
+        """Словарь key -> pickled value: из L1, а недостающие — из L2."""
+        self._sync()
+        store = self._store
+        now = time.time()
+        found = {}
+        for key in keys:
+            value = store.get(key, now)
+            if value is not None:
+                found[key] = value
+        store.stats['l1_hits'] += len(found)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            generation = store.generation
+            rows = self.db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN (%s) '
+                'AND (expires IS NULL OR expires > ?)'
+                % ', '.join('?' * len(missing)), [*missing, now]).fetchall()
+            for key, value, expires in rows:
+                found[key] = value
+                store.put(key, value, expires, generation)
+            store.stats['l2_hits'] += len(rows)
+            store.stats['misses'] += len(missing) - len(rows)
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        value = self._lookup([key]).get(key)
+        return default if value is None else pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        return {keys[key]: pickle.loads(value)
+                for key, value in self._lookup(list(keys)).items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._lookup([key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self._key(key, version),
+                 pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+                for key, value in data.items()]
+        self._write(lambda db: db.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)', rows), [key for key, _, _ in rows])
+        for key, value, expires in rows:
+            self._store.put(key, value, expires)
+        return []
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+
+        def statements(db):
+            db.execute('DELETE FROM cache WHERE key = ? AND expires <= ?',
+                       [key, time.time()])
+            return db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)', [key, pickled, expires]).rowcount
+
+        added = self._write(statements, [key])
+        if added:
+            self._store.put(key, pickled, expires)
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        result = {}
+
+        def statements(db):
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [key, time.time()]).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            result['value'] = pickle.loads(row[0]) + delta
+            result['pickled'] = pickle.dumps(result['value'],
+                                             pickle.HIGHEST_PROTOCOL)
+            result['expires'] = row[1]
+            db.execute('UPDATE cache SET value = ? WHERE key = ?',
+                       [result['pickled'], key])
+
+        self._write(statements, [key])
+        self._store.put(key, result['pickled'], result['expires'])
+        return result['value']
+
+    def update(self, key, func, timeout=DEFAULT_TIMEOUT, version=None):
+        """Атомарно для всех процессов заменяет значение ключа.
+
+        func(текущее значение или None) возвращает пару (новое значение,
+        результат); update возвращает результат. Значение читается из L2
+        в той же транзакции, что и пишется, поэтому устаревший L1 не
+        мешает.
+        """
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        result = {}
+
+        def statements(db):
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [key, time.time()]).fetchone()
+            value, result['value'] = func(
+                None if row is None else pickle.loads(row[0]))
+            result['pickled'] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute('INSERT OR REPLACE INTO cache (key, value, expires) '
+                       'VALUES (?, ?, ?)', [key, result['pickled'], expires])
+
+        self._write(statements, [key])
+        self._store.put(key, result['pickled'], expires)
+        return result['value']
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        touched = self._write(lambda db: db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [expires, key, time.time()]).rowcount, [key])
+        self._store.evict([key])
+        return bool(touched)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        self._write(lambda db: db.executemany(
+            'DELETE FROM cache WHERE key = ?', [(key,) for key in keys]),
+            keys)
+        self._store.evict(keys)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def clear(self):
+        self._write(lambda db: db.execute('DELETE FROM cache'), None)
+        self._store.clear()
+
+    def close(self, **kwargs):
+        # Соединение живёт до конца потока: открывать файл на каждый
+        # запрос дороже, чем держать его.
+        pass
@@ -0,0 +1,107 @@
+"""Чтение с реплик для представлений posts.
+
+ReplicaMiddleware отмечает GET- и HEAD-запросы к представлениям posts, и
+PrimaryReplicaRouter отправляет чтения моделей posts в таком запросе на
+случайную реплику из DATABASE_REPLICAS. Всё остальное (сессии,
+пользователи, миниатюры) и любая запись идут в default.
+
+После записи в модели posts пользователь получает cookie, и
+REPLICA_PIN_SECONDS секунд все его запросы читают с default: после
+redirect на профиль новый пост виден, даже если реплика отстаёт.
+
+Реплики SQLite — файловые копии основной базы; их обновляет
+sync_replica (команда sync_replicas) через sqlite3 backup. Время
+последней копии хранится в кэше и входит в ключи кэша и ETag страниц,
+прочитанных с реплики, чтобы устаревшая страница не пережила следующую
+синхронизацию.
+"""
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'pin_primary'
+
+_state = threading.local()
+
+
+def _sync_key(alias):
+    return f'replica-synced:{alias}'
+
+
+def replication_state():
+    """(реплика, время её синхронизации) для текущего запроса или None,
+    если запрос читает с основной базы."""
+    alias = getattr(_state, 'replica', None)
+    if alias is None or getattr(_state, 'wrote', False):
+        return None
+    return alias, cache.get(_sync_key(alias))
+
+
+def sync_replica(alias):
+    """Копирует основную базу в файл реплики целиком и согласованно."""
+    source = connections[DEFAULT_DB_ALIAS]
+    if source.in_atomic_block:
+        # backup ждёт конца своей же транзакции и зависает.
+        raise RuntimeError('sync_replica нельзя вызывать внутри транзакции')
+    source.ensure_connection()
+    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+    # Открытое соединение реплики могло закэшировать старую схему.
+    connections[alias].close()
+    cache.set(_sync_key(alias), time.time_ns(), None)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, 'replica', None)
+        if (replica is not None and model._meta.app_label == 'posts'
+                and not getattr(_state, 'wrote', False)):
+            return replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == 'posts':
+            _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default, объекты из них можно связывать.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема попадает на реплики вместе с копией базы.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica = None
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote
+        finally:
+            _state.replica = None
+            _state.wrote = False
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(PIN_COOKIE, '1', httponly=True,
+                                max_age=settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.DATABASE_REPLICAS
+                and request.method in ('GET', 'HEAD')
+                and request.resolver_match.app_name == 'posts'
+                and PIN_COOKIE not in request.COOKIES):
+            _state.replica = random.choice(settings.DATABASE_REPLICAS)
@@ -0,0 +1,76 @@
+import logging
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from posts.benchmarks import temporary_database
+from posts.models import Group, Post, User
+
+DJANGO_AUTH = 'django.contrib.auth.middleware.AuthenticationMiddleware'
+CACHED_AUTH = 'core.auth.CachedAuthenticationMiddleware'
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает число запросов и время ответа для вошедшего '
+            'пользователя с сессиями и пользователем из базы и из кэша '
+            '(core.auth).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        logging.getLogger('core.query_budget').setLevel(logging.ERROR)
+        modes = {
+            'база': ('django.contrib.sessions.backends.db',
+                     [DJANGO_AUTH if name == CACHED_AUTH else name
+                      for name in settings.MIDDLEWARE]),
+            'кэш': ('django.contrib.sessions.backends.cached_db',
+                    settings.MIDDLEWARE),
+        }
+        with temporary_database():
+            cache.clear()
+            author = User.objects.create_user(username='author')
+            group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+            Post.objects.create(text='Пост', author=author, group=group)
+            urls = {
+                'about:author': reverse('about:author'),
+                'posts:index': reverse('posts:index'),
+                'posts:group_list': reverse('posts:group_list',
+                                            kwargs={'slug': group.slug}),
+            }
+            results = {}
+            for mode, (engine, middleware) in modes.items():
+                with override_settings(SESSION_ENGINE=engine,
+                                       MIDDLEWARE=middleware):
+                    client = Client()
+                    client.force_login(author)
+                    for name, url in urls.items():
+                        results[name, mode] = self.measure(
+                            client, url, options['repeat'])
+            cache.clear()
+        self.stdout.write(f'{"страница":<18} {"база":>14} {"кэш":>14}')
+        for name in urls:
+            line = f'{name:<18}'
+            for mode in modes:
+                queries, ms = results[name, mode]
+                line += f' {queries:>3} запр. {ms:>5.2f}мс'
+            self.stdout.write(line)
+
+    def measure(self, client, url, repeat):
+        # Первый запрос заполняет кэш пользователя и фрагментов страниц.
+        client.get(url)
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+        return len(queries), statistics.median(timings)
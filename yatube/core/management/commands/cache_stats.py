@@ -0,0 +1,20 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Показывает статистику попаданий двухуровневого кэша.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'stats'):
+            raise CommandError(
+                f'Кэш {options["alias"]} не ведёт статистику.')
+        stats = cache.stats()
+        for name in ('l1_hits', 'l2_hits', 'misses', 'writes',
+                     'invalidations', 'l2_entries'):
+            self.stdout.write(f'{name:>14}: {stats[name]}')
+        self.stdout.write(f'{"hit_ratio":>14}: {stats["hit_ratio"]:.1%}')
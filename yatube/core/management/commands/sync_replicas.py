@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db_router import sync_replica
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу в файлы реплик из DATABASE_REPLICAS.'
+
+    def handle(self, *args, **options):
+        for alias in settings.DATABASE_REPLICAS:
+            sync_replica(alias)
+            self.stdout.write(f'{alias}: скопирована')
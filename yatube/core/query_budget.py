@@ -0,0 +1,115 @@
+"""Учёт SQL-запросов по представлениям.
+
+QueryBudgetMiddleware считает и замеряет запросы каждого запроса к сайту
+и пишет в лог представления, превысившие бюджет из QUERY_BUDGETS.
+В отчёте одинаковые с точностью до параметров запросы сгруппированы,
+поэтому источник N+1 виден сразу. Считаются запросы ко всем базам из
+DATABASES, включая реплики (core.db_router).
+"""
+import contextlib
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+def normalize_sql(sql):
+    """Заменяет литералы на ?, чтобы однотипные запросы совпали."""
+    sql = _LITERALS.sub('?', sql)
+    return _IN_LISTS.sub('(...)', sql)
+
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def unrecorded():
+    """Запросы внутри блока не попадают в QueryRecorder этого потока:
+    так фоновая работа, выполненная на месте (THUMBNAIL_WORKERS = 0),
+    не считается в бюджет страницы."""
+    _local.paused = getattr(_local, 'paused', 0) + 1
+    try:
+        yield
+    finally:
+        _local.paused -= 1
+
+
+class QueryRecorder:
+    """Контекстный менеджер: собирает SQL и время выполнения запросов
+    ко всем базам или только к using."""
+
+    def __init__(self, using=None):
+        self.using = using
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'paused', 0):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __enter__(self):
+        self._wrappers = contextlib.ExitStack()
+        aliases = [self.using] if self.using else connections
+        for alias in aliases:
+            self._wrappers.enter_context(
+                connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrappers.__exit__(*exc_info)
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self):
+        """Пары (нормализованный SQL, число повторов), частые первыми."""
+        return Counter(normalize_sql(sql)
+                       for sql, _ in self.queries).most_common()
+
+    def report(self):
+        lines = [f'{len(self)} запросов, {self.duration * 1000:.1f} мс']
+        lines += [f'  {count:>4} × {sql}' for sql, count in self.duplicates()]
+        return '\n'.join(lines)
+
+
+def get_budget(view_name):
+    return settings.QUERY_BUDGETS.get(view_name,
+                                      settings.QUERY_BUDGET_DEFAULT)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is not None and len(recorder) > get_budget(match.view_name):
+            # Одна строка в WARNING, полный отчёт — в DEBUG.
+            sql, count = recorder.duplicates()[0]
+            logger.warning('%s %s: превышен бюджет запросов (%s): %s '
+                           'запросов, %.1f мс; чаще всего %s × %s',
+                           request.method, match.view_name,
+                           get_budget(match.view_name), len(recorder),
+                           recorder.duration * 1000, count, sql)
+            logger.debug('%s %s: %s', request.method, match.view_name,
+                         recorder.report())
+        return response
@@ -0,0 +1,45 @@
+"""Хранилище загрузок с именами по содержимому.
+
+ContentAddressedStorage сохраняет файл под именем
+<каталог upload_to>/<первые два символа>/<sha256 содержимого><расширение>:
+одинаковые загрузки хранятся один раз, а файл по имени никогда не
+меняется, поэтому его можно отдавать с Cache-Control: immutable
+(core.views.media). Подкаталоги по префиксу хэша не дают одному каталогу
+вырасти до миллионов файлов.
+
+Фоновая обработка (posts.images) тоже не перезаписывает файл: повёрнутая
+и уменьшенная картинка сохраняется под своим хэшем, а посты переключаются
+на новое имя.
+
+Повторная загрузка существующего файла обновляет его mtime: сборщик
+мусора (posts.media_gc) не трогает свежие файлы и не удалит сироту,
+на которую только что снова сослались.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
@@ -0,0 +1,162 @@
+import contextlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .db_router import sync_replica
+from .query_budget import QueryRecorder
+
+
+@contextlib.contextmanager
+def temporary_cache():
+    """Переносит все кэши из CACHES во временный каталог: тесты и
+    бенчмарки не читают и не очищают кэш запущенного сервера."""
+    with tempfile.TemporaryDirectory() as directory:
+        caches = {alias: {**params,
+                          'LOCATION': os.path.join(directory,
+                                                   f'{alias}.sqlite3')}
+                  for alias, params in settings.CACHES.items()}
+        with override_settings(CACHES=caches):
+            yield
+
+
+class TestRunner(DiscoverRunner):
+    """Запуск тестов с кэшем во временном каталоге (temporary_cache).
+    Бюджеты запросов проверяет QueryBudgetTestMixin, поэтому отчёты
+    core.query_budget в выводе тестов не нужны."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        logging.getLogger('core.query_budget').setLevel(logging.ERROR)
+        self._cache = contextlib.ExitStack()
+        self._cache.enter_context(temporary_cache())
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache.close()
+        super().teardown_test_environment(**kwargs)
+
+
+class OnCommitTestMixin:
+    """captureOnCommitCallbacks из Django 3.2: в TestCase транзакция теста
+    не коммитится, и transaction.on_commit сам не срабатывает."""
+
+    @classmethod
+    @contextlib.contextmanager
+    def captureOnCommitCallbacks(cls, *, using=DEFAULT_DB_ALIAS,
+                                 execute=False):
+        """Собирает функции on_commit, отложенные внутри блока;
+        execute=True вызывает их на выходе, как после коммита."""
+        callbacks = []
+        start = len(connections[using].run_on_commit)
+        try:
+            yield callbacks
+        finally:
+            callbacks[:] = [func for _, func in
+                            connections[using].run_on_commit[start:]]
+            if execute:
+                for callback in callbacks:
+                    callback()
+
+
+class QueryBudgetTestMixin:
+    """Проверки числа SQL-запросов для TestCase."""
+
+    def assertQueryCountStable(self, fetch, grow, msg=''):
+        """fetch() выполняет запрос к странице, grow() добавляет данные.
+        Число запросов после grow() не должно вырасти."""
+        with QueryRecorder() as before:
+            fetch()
+        grow()
+        with QueryRecorder() as after:
+            fetch()
+        if len(after) > len(before):
+            self.fail(f'{msg}: число запросов выросло с {len(before)} '
+                      f'до {len(after)}\n{after.report()}')
+
+
+class ReplicaTestMixin:
+    """Поднимает реплики — файловые копии тестовой базы.
+
+    Только для TransactionTestCase: копируются закоммиченные данные.
+    Копии снимаются в setUp и затем только вызовом sync_replicas(), так
+    что между синхронизациями реплика отстаёт от default.
+    """
+    replicas = ('replica',)
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        for alias in self.replicas:
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': f'{directory}/{alias}.sqlite3',
+            }
+            self.addCleanup(self._drop_replica, alias)
+        replicas = override_settings(DATABASE_REPLICAS=list(self.replicas))
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        self.sync_replicas()
+
+    @staticmethod
+    def _drop_replica(alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+    def sync_replicas(self):
+        for alias in self.replicas:
+            sync_replica(alias)
+
+
+class QueryPlanTestMixin:
+    """Проверка планов запросов SQLite через EXPLAIN QUERY PLAN."""
+
+    # Поиск по индексу — шаг SEARCH. SCAN — полный проход таблицы или
+    # индекса (кроме MATCH по виртуальной таблице FTS), TEMP B-TREE —
+    # сортировка во временном B-дереве.
+    bad_plan_steps = (re.compile(r'^SCAN (?!.*\bVIRTUAL TABLE INDEX \d+:M)'),
+                      re.compile(r'TEMP B-TREE'))
+    limit_clause = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedQueries(self, fetch, msg='', limited=()):
+        """Каждый SELECT, выполненный в fetch(), ищет по индексу.
+
+        limited — регулярные выражения шагов, допустимых только в
+        запросах с LIMIT: обход индекса с начала у ленты без условия и
+        сортировка найденных FTS строк по релевантности.
+        """
+        limited = [re.compile(pattern) for pattern in limited]
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            fetch()
+        problems = []
+        for sql, params in queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            allowed = limited if self.limit_clause.search(sql) else []
+            steps = self.explain(sql, params)
+            bad = [step for step in steps
+                   if any(p.search(step) for p in self.bad_plan_steps)
+                   and not any(p.search(step) for p in allowed)]
+            if bad:
+                problems.append(f'{sql}\n    ' + '\n    '.join(bad))
+        if problems:
+            self.fail(f'{msg}: запросы без индекса\n' + '\n'.join(problems))
@@ -0,0 +1,99 @@
+"""Ограничение частоты записи: корзины токенов в кэше.
+
+Декоратор throttle(scope) пропускает GET как есть, а каждый POST берёт
+по токену из корзин пользователя и IP-адреса; из пустой корзины запрос
+получает 429 с Retry-After. Ёмкость и скорость пополнения корзин каждой
+области задаёт THROTTLE_RATES; области без записи там не ограничиваются.
+Корзина обновляется атомарно для всех процессов через TieredCache.update
+(core.cache).
+
+Заодно декоратор замеряет время SQL-запросов пропущенной записи. Если
+оно больше THROTTLE_WRITER_BUSY — писатель SQLite занят и запросы ждут
+блокировку, — все ограничиваемые записи THROTTLE_SHED_SECONDS секунд
+получают 429, и очередь к блокировке не растёт, пока чтения ждут.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+from .query_budget import QueryRecorder
+
+SHED_KEY = 'throttle:shed'
+
+
+def _update(key, func, timeout):
+    update = getattr(cache, 'update', None)
+    if update is not None:
+        return update(key, func, timeout)
+    # Без атомарного update гонка процессов может пропустить лишний запрос.
+    value, result = func(cache.get(key))
+    cache.set(key, value, timeout)
+    return result
+
+
+def take(key, capacity, rate):
+    """Берёт токен из корзины; 0 — взят, иначе секунды до нового токена."""
+    now = time.time()
+
+    def consume(state):
+        tokens, stamp = state or (capacity, now)
+        tokens = min(capacity, tokens + max(0, now - stamp) * rate)
+        if tokens >= 1:
+            return (tokens - 1, now), 0
+        return (tokens, now), (1 - tokens) / rate
+
+    # Корзина, которая успела наполниться, не отличается от отсутствующей.
+    return _update(key, consume, math.ceil(capacity / rate))
+
+
+def shed_for():
+    """Сколько секунд ещё отклонять все записи (0 — не отклонять)."""
+    until = cache.get(SHED_KEY)
+    return max(0, until - time.time()) if until else 0
+
+
+def shed():
+    seconds = settings.THROTTLE_SHED_SECONDS
+    cache.set(SHED_KEY, time.time() + seconds, seconds)
+
+
+def buckets(request, scope):
+    rates = settings.THROTTLE_RATES.get(scope, {})
+    if 'ip' in rates:
+        address = request.META.get('REMOTE_ADDR')
+        yield f'throttle:{scope}:ip:{address}', rates['ip']
+    if 'user' in rates and request.user.is_authenticated:
+        yield f'throttle:{scope}:user:{request.user.pk}', rates['user']
+
+
+def too_many_requests(request, retry_after):
+    response = render(request, 'core/429.html', status=429)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def throttle(scope):
+    """Декоратор представления: лимиты POST из THROTTLE_RATES[scope]."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST':
+                return view(request, *args, **kwargs)
+            retry_after = shed_for()
+            for key, (capacity, rate) in buckets(request, scope):
+                retry_after = retry_after or take(key, capacity, rate)
+            if retry_after:
+                return too_many_requests(request, retry_after)
+            recorder = QueryRecorder()
+            try:
+                with recorder:
+                    return view(request, *args, **kwargs)
+            finally:
+                if recorder.duration > settings.THROTTLE_WRITER_BUSY:
+                    shed()
+        return wrapper
+    return decorator
@@ -1,4 +1,15 @@
+import mimetypes
+import posixpath
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+# Год: имена загрузок и миниатюр меняются вместе с содержимым
+# (core.storage.ContentAddressedStorage, ключи sorl-thumbnail).
+MEDIA_MAX_AGE = 365 * 24 * 60 * 60
 
 
 def csrf_failure(request, reason=''):
@@ -9,3 +20,28 @@ def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
     # выводить её в шаблон пользовательской страницы 404 мы не станем
     return render(request, 'core/404.html', {'path': request.path}, status=404)
+
+
+def media(request, path):
+    """Картинки и миниатюры из MEDIA_ROOT с Cache-Control: immutable.
+
+    Если задан MEDIA_ACCEL_HEADER, файл отдаёт обратный прокси: ответ
+    пустой, а в заголовке — путь MEDIA_ACCEL_PREFIX + path (внутренний
+    location nginx для X-Accel-Redirect или каталог на диске для
+    X-Sendfile).
+    """
+    header = settings.MEDIA_ACCEL_HEADER
+    if header:
+        path = posixpath.normpath(path).lstrip('/')
+        if path.startswith('..'):
+            raise Http404
+        content_type, _ = mimetypes.guess_type(path)
+        response = HttpResponse(
+            content_type=content_type or 'application/octet-stream')
+        response[header] = settings.MEDIA_ACCEL_PREFIX + path
+    else:
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code in (200, 304):
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=MEDIA_MAX_AGE)
+    return response
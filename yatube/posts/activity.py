@@ -0,0 +1,58 @@
+"""Активность постов в лентах: число комментариев и время последнего.
+
+Оба значения приходят тем же запросом, что и посты страницы: число — из
+счётчика comments:post:<id> (posts.counters), время — из последнего
+комментария по индексу comment_post_created_idx. Коррелированные
+подзапросы выполняются только для строк страницы, поэтому лента не
+группирует комментарии.
+
+Для сортировки ленты группы по активности у поста есть поле
+last_activity — время публикации или последнего комментария. Его
+поддерживают сигналы комментариев, а после массовой загрузки — refresh.
+"""
+from django.apps import apps as global_apps
+from django.db.models import CharField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+
+from . import counters
+
+ACTIVITY_ORDERING = ('-last_activity', '-id')
+
+
+def _model(name, apps=global_apps):
+    return apps.get_model('posts', name)
+
+
+def _latest_comment(apps=global_apps):
+    return (_model('Comment', apps).objects
+            .filter(post=OuterRef('pk'))
+            .order_by('-created', '-id').values('created')[:1])
+
+
+def with_activity(queryset):
+    """Добавляет к постам comment_count и last_comment (None без
+    комментариев)."""
+    counter_key = Concat(Value(counters.post_comments('')),
+                         Cast(OuterRef('pk'), CharField()))
+    comment_count = (_model('Counter').objects.filter(key=counter_key)
+                     .values('value')[:1])
+    return queryset.annotate(
+        comment_count=Coalesce(Subquery(comment_count), Value(0)),
+        last_comment=Subquery(_latest_comment()),
+    )
+
+
+def touch(post_id, when):
+    """Сдвигает last_activity поста вперёд до when."""
+    _model('Post').objects.filter(pk=post_id, last_activity__lt=when).update(
+        last_activity=when)
+
+
+def refresh(post_ids=None, apps=global_apps):
+    """Пересчитывает last_activity по комментариям (всем постам или
+    post_ids)."""
+    posts = _model('Post', apps).objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    return posts.update(last_activity=Coalesce(
+        Subquery(_latest_comment(apps)), F('pub_date')))
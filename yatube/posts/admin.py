@@ -1,9 +1,112 @@
+from functools import partial
+
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
 
+from . import counters
 from .models import Comment, Follow, Group, Post
+from .search import backend as search_backend
+from .utils import EstimatedCountPaginator, date_bounds
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """Автодополнение, подпись выбранного значения которого берётся из
+    уже загруженного объекта loaded, а не отдельным запросом."""
+
+    loaded = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = {str(v) for v in value
+                    if str(v) not in self.choices.field.empty_values}
+        if self.loaded is None or selected != {str(self.loaded.pk)}:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        label = self.choices.field.label_from_instance(self.loaded)
+        options.append(self.create_option(name, self.loaded.pk, label,
+                                          True, len(options)))
+        return [(None, options, 0)]
+
+
+class IndexedDateChangeList(ChangeList):
+    """Год, месяц и день date_hierarchy фильтруют по диапазону дат, а не
+    по частям, извлечённым из даты каждой строки: так работает индекс."""
+
+    def get_filters(self, request):
+        specs, has_filters, lookup_params, use_distinct = (
+            super().get_filters(request))
+        if self.date_hierarchy:
+            parts = [lookup_params.pop(f'{self.date_hierarchy}__{part}',
+                                       None)
+                     for part in ('year', 'month', 'day')]
+            if parts[0] is not None:
+                try:
+                    start, end = date_bounds(*parts)
+                except (TypeError, ValueError) as error:
+                    raise IncorrectLookupParameters(error) from error
+                lookup_params[f'{self.date_hierarchy}__gte'] = start
+                lookup_params[f'{self.date_hierarchy}__lt'] = end
+        return specs, has_filters, lookup_params, use_distinct
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Списки админки для больших таблиц.
+
+    Связанные объекты приходят в запросе страницы (list_select_related),
+    внешние ключи выбираются автодополнением, а подписи в list_editable
+    берутся из объектов строки. Все строки не считаются
+    (EstimatedCountPaginator, count_counter — ключ posts.counters с
+    размером таблицы), навигация — date_hierarchy по индексированной дате:
+    фильтр по диапазону (IndexedDateChangeList), а годы, месяцы и дни
+    ищутся по индексу (тег indexed_date_hierarchy).
+    """
 
+    paginator = EstimatedCountPaginator
+    change_list_template = 'admin/large_table_change_list.html'
+    show_full_result_count = False
+    count_counter = None
 
-class PostAdmin(admin.ModelAdmin):
+    def get_changelist(self, request, **kwargs):
+        return IndexedDateChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        estimate = None
+        if self.count_counter is not None:
+            estimate = partial(counters.get, self.count_counter)
+        return self.paginator(queryset, per_page, orphans,
+                              allow_empty_first_page, estimate=estimate)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', LoadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_formset(self, request, **kwargs):
+        fields = self.get_autocomplete_fields(request)
+
+        class FormSet(super().get_changelist_formset(request, **kwargs)):
+            def _construct_form(self, i, **kwargs):
+                form = super()._construct_form(i, **kwargs)
+                for name in fields:
+                    if name not in form.fields:
+                        continue
+                    widget = form.fields[name].widget
+                    # Обычно виджет обёрнут в RelatedFieldWidgetWrapper.
+                    widget = getattr(widget, 'widget', widget)
+                    if isinstance(widget, LoadedAutocompleteSelect):
+                        widget.loaded = getattr(form.instance, name)
+                return form
+
+        return FormSet
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,21 +115,39 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    count_counter = counters.ALL_POSTS
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тому же полнотекстовому индексу, что и на сайте.
+        if not search_term:
+            return queryset, False
+        return search_backend.filter(queryset, search_term), False
+
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
         'author',
+        'post',
         'created'
     )
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    date_hierarchy = 'created'
+
+
+class GroupAdmin(admin.ModelAdmin):
+    search_fields = ('title', 'slug')
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow)
@@ -0,0 +1,156 @@
+"""JSON API лент только для чтения.
+
+Общая лента, лента группы, лента автора и пост с комментариями отдаются
+прямо из строк values(): экземпляры моделей, шаблоны и миниатюры не
+создаются. ?fields=id,text,author выбирает поля ответа, и запрос читает
+только нужные столбцы (как .only(), но без экземпляров); соединения с
+автором и группой и подзапросы активности добавляются, только если эти
+поля запрошены.
+
+Страницы курсорные (posts.utils.CursorPaginator), ссылки на соседние
+страницы — в next и previous. Условные GET обрабатывает тот же
+posts.conditional.condition, что и у HTML-страниц: ETag включает полный
+путь, поэтому разные наборы полей не смешиваются.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+
+from .activity import with_activity
+from .conditional import (condition, group_state, index_state, post_state,
+                          profile_state)
+from .models import Comment, Group, Post, User
+from .utils import COMMENT_ORDERING, CURSOR_ORDERING, CursorPaginator
+
+# Поле ответа -> столбец values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'modified': 'modified',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+    'last_comment': 'last_comment',
+}
+# Поля из posts.activity.with_activity.
+ACTIVITY_FIELDS = {'comment_count', 'last_comment'}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+
+def error(message, status):
+    return JsonResponse({'detail': message}, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def parse_fields(request):
+    """Поля из ?fields= в порядке запроса; ValueError для неизвестных."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(POST_FIELDS)
+    fields = list(dict.fromkeys(
+        name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in POST_FIELDS]
+    if unknown or not fields:
+        raise ValueError(
+            f'Неизвестные поля: {", ".join(unknown)}. Доступны: '
+            f'{", ".join(POST_FIELDS)}.')
+    return fields
+
+
+def post_rows(queryset, fields, ordering=()):
+    """values() с нужными столбцами и столбцами сортировки."""
+    if ACTIVITY_FIELDS.intersection(fields):
+        queryset = with_activity(queryset)
+    columns = {POST_FIELDS[name] for name in fields}
+    columns.update(name.lstrip('-') for name in ordering)
+    return queryset.values(*columns)
+
+
+def serialize(row, fields, mapping):
+    item = {name: row[mapping[name]] for name in fields}
+    if 'image' in item:
+        item['image'] = (default_storage.url(item['image'])
+                         if item['image'] else None)
+    return item
+
+
+def page_link(request, name, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params[name] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def paginate(request, rows, per_page, ordering, fields, mapping):
+    page = CursorPaginator(rows, per_page, ordering).get_page(
+        request.GET.get('after'), request.GET.get('before'))
+    return {
+        'results': [serialize(row, fields, mapping) for row in page],
+        'next': page_link(request, 'after', page.next_cursor),
+        'previous': page_link(request, 'before', page.previous_cursor),
+    }
+
+
+def feed_response(request, posts):
+    try:
+        fields = parse_fields(request)
+    except ValueError as exc:
+        return error(str(exc), 400)
+    rows = post_rows(posts, fields, CURSOR_ORDERING)
+    return JsonResponse(paginate(request, rows, settings.API_PAGE_SIZE,
+                                 CURSOR_ORDERING, fields, POST_FIELDS),
+                        json_dumps_params={'ensure_ascii': False})
+
+
+@condition(index_state)
+def feed(request):
+    return feed_response(request, Post.objects.all())
+
+
+@condition(group_state)
+def group_feed(request, slug):
+    group_id = (Group.objects.filter(slug=slug)
+                .values_list('pk', flat=True).first())
+    if group_id is None:
+        return error('Группа не найдена.', 404)
+    return feed_response(request, Post.objects.filter(group_id=group_id))
+
+
+@condition(profile_state)
+def author_feed(request, username):
+    author_id = (User.objects.filter(username=username)
+                 .values_list('pk', flat=True).first())
+    if author_id is None:
+        return error('Автор не найден.', 404)
+    return feed_response(request, Post.objects.filter(author_id=author_id))
+
+
+@condition(post_state)
+def post_detail(request, post_id):
+    """Пост и страница его комментариев; after и before листают
+    комментарии."""
+    try:
+        fields = parse_fields(request)
+    except ValueError as exc:
+        return error(str(exc), 400)
+    row = post_rows(Post.objects.filter(pk=post_id), fields).first()
+    if row is None:
+        return error('Пост не найден.', 404)
+    comments = (Comment.objects.filter(post_id=post_id)
+                .values(*COMMENT_FIELDS.values()))
+    return JsonResponse(
+        {'post': serialize(row, fields, POST_FIELDS),
+         'comments': paginate(request, comments,
+                              settings.COMMENTS_PER_PAGE, COMMENT_ORDERING,
+                              list(COMMENT_FIELDS), COMMENT_FIELDS)},
+        json_dumps_params={'ensure_ascii': False})
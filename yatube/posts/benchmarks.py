@@ -0,0 +1,115 @@
+"""Общие помощники для команд bench_*: временная база, наполнение, замеры."""
+import contextlib
+import ctypes
+import ctypes.util
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.testing import temporary_cache
+
+from .models import Post
+from .utils import explicit_dates
+
+SEED_BATCH_SIZE = 5000
+
+
+@contextlib.contextmanager
+def temporary_database(name=None):
+    """Создаёт пустую тестовую базу и удаляет её после замеров,
+    чтобы бенчмарки не трогали рабочие данные. Кэш на это время тоже
+    временный (core.testing.temporary_cache).
+
+    name — файл базы; нужен, когда с базой работают несколько процессов
+    (по умолчанию SQLite создаёт тестовую базу в памяти).
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings['NAME']
+    if name is not None:
+        test_settings['NAME'] = name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                       serialize=False)
+    try:
+        with temporary_cache():
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+
+
+def seed_posts(count, author, group=None, start=None, text=None):
+    """Пакетно создаёт count постов, по одному в минуту от start назад.
+
+    text(i) возвращает текст i-го поста; по умолчанию «Пост номер i».
+    """
+    start = start or timezone.now()
+    text = text or 'Пост номер {}'.format
+    pub_date = Post._meta.get_field('pub_date')
+    with explicit_dates(pub_date):
+        for offset in range(0, count, SEED_BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(text=text(i), author=author, group=group,
+                     pub_date=start - timedelta(minutes=i),
+                     last_activity=start - timedelta(minutes=i))
+                for i in range(offset, min(offset + SEED_BATCH_SIZE, count))
+            )
+
+
+def measure(func, repeat=5):
+    """Возвращает медиану времени (мс) и число SQL-запросов вызова func."""
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(queries)
+
+
+def _peak_rss():
+    """Пиковый RSS процесса в байтах (только Linux)."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def fix_mmap_threshold(threshold=128 * 1024):
+    """Отключает подстройку порога mmap в glibc: крупные буферы (Pillow)
+    тогда всегда выделяются через mmap и возвращаются системе, и пик RSS
+    каждого замера не прячется в ранее освобождённой куче."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'))
+        # M_MMAP_THRESHOLD из malloc.h.
+        return bool(libc.mallopt(-3, threshold))
+    except (OSError, AttributeError):
+        return False
+
+
+def measure_memory(func):
+    """Пик памяти Python и пик RSS процесса сверх исходного (байты) за
+    один вызов func. Память декодеров Pillow видна только в RSS; где его
+    нельзя сбросить (не Linux), вместо него None. tracemalloc замедляет
+    вызов, поэтому время здесь не замеряется."""
+    try:
+        # Сбрасывает VmHWM до текущего RSS.
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        baseline = _peak_rss()
+    except OSError:
+        baseline = None
+    tracemalloc.start()
+    try:
+        func()
+        python_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    rss_peak = None if baseline is None else _peak_rss() - baseline
+    return python_peak, rss_peak
@@ -0,0 +1,65 @@
+"""Кэш отрисованных карточек постов для лент.
+
+Карточка (posts/includes/post_card.html) хранится в кэше под ключом из
+варианта разметки, id поста, его поля modified и активности (число
+комментариев и время последнего), поэтому правка поста, замена картинки
+через post_edit или новый комментарий сами делают старую карточку
+ненужной. Страница ленты берёт карточки одним get_many и рисует только
+недостающие, так что после сброса фрагмента ленты (любой новый пост)
+заново отрисовывается лишь то, что действительно изменилось.
+
+Карточка с картинкой, для которой ещё нет миниатюры, не кэшируется: в ней
+ссылка на исходник, а миниатюра скоро появится. Имя автора и адрес группы
+в ключ не входят — их изменения видны по истечении POST_CARD_TIMEOUT.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+from sorl.thumbnail import default
+
+TEMPLATE = 'posts/includes/post_card.html'
+# Миниатюра из post_card.html.
+THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+
+
+def _stamp(value):
+    return int(value.timestamp() * 10 ** 6) if value else 0
+
+
+def card_key(post, variant):
+    """variant — разметка страницы: index, follow, group или profile."""
+    # Активность есть только у постов из posts.activity.with_activity.
+    activity = (getattr(post, 'comment_count', 0),
+                _stamp(getattr(post, 'last_comment', None)))
+    return (f'post-card:{variant}:{post.pk}:{_stamp(post.modified)}:'
+            f'{activity[0]}:{activity[1]}')
+
+
+def _thumbnail_ready(post):
+    geometry_string, options = THUMBNAIL
+    return not post.image or default.backend.lookup(
+        post.image, geometry_string, **options) is not None
+
+
+def render_card(template, post, variant):
+    return template.render({'post': post, 'variant': variant})
+
+
+def render_cards(posts, variant):
+    """HTML карточек в порядке posts: из кэша, недостающие — заново."""
+    posts = list(posts)
+    keys = [card_key(post, variant) for post in posts]
+    cards = cache.get_many(keys)
+    fresh = {}
+    template = None
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            # Шаблон загружается один раз на страницу, и только при промахе.
+            template = template or get_template(TEMPLATE)
+            cards[key] = render_card(template, post, variant)
+            if _thumbnail_ready(post):
+                fresh[key] = cards[key]
+    if fresh:
+        cache.set_many(fresh, settings.POST_CARD_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
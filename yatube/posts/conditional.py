@@ -0,0 +1,122 @@
+"""Условные GET-запросы для лент и страницы поста.
+
+Валидаторы считаются до рендеринга по дешёвым данным: версиям из
+posts.feed_cache, счётчикам и дате новейшей записи. Если присланные
+клиентом If-None-Match или If-Modified-Since совпали, представление не
+вызывается и клиент получает 304 без шаблонов и миниатюр.
+
+ETag слабый (токен CSRF в формах меняется от рендеринга к рендерингу) и
+включает пользователя и полный путь с параметрами страницы. Last-Modified
+отдаётся только анонимам: страница вошедшего пользователя зависит не от
+одного времени записи, а, например, ещё и от подписки на автора.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from core.db_router import replication_state
+
+from . import counters, feed_cache
+from .models import Comment, Follow, Group, Post, User
+
+
+def make_etag(request, parts):
+    parts = [*parts, request.user.pk, request.get_full_path(),
+             replication_state()]
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def condition(validators):
+    """Декоратор: 304 по валидаторам, иначе вызов представления.
+
+    validators(request, *args, **kwargs) возвращает пару (значения для
+    ETag, время последнего изменения) или None, если объекта нет — тогда
+    ответ (обычно 404) строит само представление.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            state = validators(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            parts, last_modified = state
+            etag = make_etag(request, parts)
+            timestamp = None
+            if last_modified is not None and request.user.is_anonymous:
+                timestamp = int(last_modified.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.setdefault('ETag', etag)
+                if timestamp is not None:
+                    response.setdefault('Last-Modified', http_date(timestamp))
+                # Без no-cache браузер может эвристически не спрашивать
+                # сервер вовсе и показывать устаревшую ленту.
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _feed_state(posts, counter_key, scope, *extra):
+    version, = feed_cache.get_versions(scope)
+    newest = (posts.order_by('-pub_date')
+              .values_list('pub_date', flat=True).first())
+    count = counters.get(counter_key)
+    last_modified = feed_cache.version_time(version)
+    if newest is not None:
+        last_modified = max(last_modified, newest)
+    return [version, newest, count, *extra], last_modified
+
+
+def index_state(request):
+    return _feed_state(Post.objects.all(), counters.ALL_POSTS,
+                       feed_cache.INDEX)
+
+
+def group_state(request, slug):
+    group_id = (Group.objects.filter(slug=slug)
+                .values_list('pk', flat=True).first())
+    if group_id is None:
+        return None
+    return _feed_state(Post.objects.filter(group_id=group_id),
+                       counters.group_posts(group_id),
+                       feed_cache.group_scope(group_id))
+
+
+def profile_state(request, username):
+    author_id = (User.objects.filter(username=username)
+                 .values_list('pk', flat=True).first())
+    if author_id is None:
+        return None
+    following = (request.user.is_authenticated
+                 and Follow.objects.filter(user=request.user,
+                                           author_id=author_id).exists())
+    return _feed_state(Post.objects.filter(author_id=author_id),
+                       counters.author_posts(author_id),
+                       feed_cache.author_scope(author_id), following)
+
+
+def post_state(request, post_id):
+    post = (Post.objects.filter(pk=post_id)
+            .values('modified', 'author_id').first())
+    if post is None:
+        return None
+    version, = feed_cache.get_versions(feed_cache.post_scope(post_id))
+    latest_comment = (Comment.objects.filter(post_id=post_id)
+                      .order_by('-created')
+                      .values_list('created', flat=True).first())
+    counts = counters.get_many(counters.post_comments(post_id),
+                               counters.author_posts(post['author_id']))
+    last_modified = max(post['modified'], feed_cache.version_time(version))
+    if latest_comment is not None:
+        last_modified = max(last_modified, latest_comment)
+    return ([version, post['modified'], latest_comment,
+             *counts.values()], last_modified)
@@ -0,0 +1,90 @@
+"""Версии лент для кэша фрагментов шаблонов.
+
+У общей ленты, каждой группы и каждого автора есть версия в кэше. Сигналы
+меняют её после коммита сохранения или удаления поста и комментария, а ключ
+фрагмента включает версию и номер страницы (или курсор). Поэтому после
+записи старые фрагменты просто перестают запрашиваться, и срок жизни кэша
+можно держать в минутах.
+
+Версия — время последней записи в ленту в наносекундах, поэтому она же
+служит Last-Modified для условных GET-запросов (posts.conditional).
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.db_router import replication_state
+
+INDEX = 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(user_id):
+    return f'author:{user_id}'
+
+
+def post_scopes(author_id, *group_ids):
+    """Ленты, в которых виден пост с такими автором и группами."""
+    scopes = [INDEX, author_scope(author_id)]
+    scopes += [group_scope(group_id) for group_id in set(group_ids)
+               if group_id is not None]
+    return scopes
+
+
+def post_scope(post_id):
+    """Комментарии поста: их нет ни в одной ленте."""
+    return f'post:{post_id}'
+
+
+def _version_key(scope):
+    return f'feed-version:{scope}'
+
+
+def get_versions(*scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    # Начальная версия — текущее время: если версия вытеснена из кэша,
+    # новая не совпадёт ни с одной из прежних.
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    now = time.time_ns()
+    # Версия только растёт, даже если часы процесса отстают.
+    cache.set_many({key: max(now, versions.get(key, 0) + 1)
+                    for key in keys}, None)
+
+
+def bump_on_commit(*scopes):
+    """bump после коммита текущей транзакции: до него параллельный запрос
+    прочитал бы старые строки и сохранил фрагмент под новой версией."""
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def version_time(version):
+    """Время записи, которому соответствует версия ленты."""
+    return datetime.datetime.fromtimestamp(version / 10 ** 9,
+                                           datetime.timezone.utc)
+
+
+def fragment_context(request, *scopes):
+    """Ключ фрагмента ленты и срок его жизни для тега {% cache %}."""
+    parts = [str(version) for version in get_versions(*scopes)]
+    parts += [request.GET.get(name, '')
+              for name in ('page', 'after', 'before', 'sort')]
+    # Фрагмент с отстающей реплики живёт только до её синхронизации.
+    parts += map(str, replication_state() or ())
+    return {'feed_key': ':'.join(parts),
+            'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT}
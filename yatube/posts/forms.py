@@ -1,5 +1,6 @@
 from django.forms import ModelForm
 
+from .images import validate_upload
 from .models import Comment, Post
 
 
@@ -8,6 +9,11 @@ class PostForm(ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        validate_upload(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,133 @@
+"""Приём картинок постов.
+
+На пути запроса картинка только проверяется и сохраняется как есть:
+загрузка пишется во временный файл (FILE_UPLOAD_HANDLERS) и переносится в
+MEDIA_ROOT без копирования, а размеры читаются из заголовка без
+декодирования — картинка больше IMAGE_MAX_PIXELS отклоняется как
+декомпрессионная бомба.
+
+Остальное делает ingest в фоновом пуле миниатюр после коммита: поворачивает
+картинку по EXIF, уменьшает до IMAGE_MAX_SIDE, сохраняет результат под
+новым именем по содержимому, переключает на него посты и только потом
+ставит в очередь миниатюры. Исходник на месте не перезаписывается: его
+адрес уже мог уйти клиентам с Cache-Control: immutable (core.views.media),
+а у новой картинки и миниатюры получают новые адреса. Старый файл с его
+миниатюрами удалит сборщик мусора (posts.media_gc). JPEG декодируется
+сразу в уменьшенном масштабе (draft), поэтому фотография на 20 МБ не
+разворачивается в памяти целиком.
+"""
+import logging
+import posixpath
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import feed_cache, thumbnails
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Тег EXIF с ориентацией снимка.
+ORIENTATION = 0x0112
+
+
+def save_options(image_format):
+    """Параметры пересохранения тем же кодеком; None — формат не трогаем."""
+    return {
+        'JPEG': {'quality': settings.IMAGE_JPEG_QUALITY, 'optimize': True},
+        'PNG': {'optimize': True},
+        'WEBP': {'quality': settings.IMAGE_JPEG_QUALITY},
+    }.get(image_format)
+
+
+def validate_upload(upload):
+    """Проверка на пути запроса: размер файла и размеры из заголовка."""
+    if not isinstance(upload, UploadedFile):
+        return
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            params={'limit': settings.IMAGE_MAX_UPLOAD_SIZE // 2 ** 20},
+            code='file_too_large')
+    # forms.ImageField уже открыл картинку; пиксели не декодировались.
+    width, height = upload.image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка %(width)s×%(height)s слишком большая.',
+            params={'width': width, 'height': height},
+            code='too_many_pixels')
+
+
+def fit(size, max_side):
+    """Размер, вписанный в квадрат max_side с сохранением пропорций."""
+    width, height = size
+    scale = min(1, max_side / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def normalize(name):
+    """Поворачивает картинку по EXIF и уменьшает её.
+
+    Результат сохраняется рядом под новым именем по содержимому; исходник
+    не меняется. Возвращает новое имя или None, если обработка не нужна.
+    """
+    max_side = settings.IMAGE_MAX_SIDE
+    with default_storage.open(name) as source, Image.open(source) as image:
+        image_format = image.format
+        options = save_options(image_format)
+        # Анимацию и незнакомые форматы оставляем как есть.
+        if options is None or getattr(image, 'n_frames', 1) > 1:
+            return None
+        orientation = image.getexif().get(ORIENTATION, 1)
+        if orientation == 1 and max(image.size) <= max_side:
+            return None
+        # JPEG сразу декодируется в 2–8 раз меньше, если это возможно, а
+        # поворачивается уже уменьшенная копия.
+        image.draft(image.mode, fit(image.size, max_side))
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+        with tempfile.TemporaryFile() as f:
+            image.save(f, image_format, exif=image.getexif(), **options)
+            # Хранилище добавит к каталогу upload_to префикс нового хэша.
+            upload_to = posixpath.dirname(posixpath.dirname(name))
+            return default_storage.save(
+                posixpath.join(upload_to, posixpath.basename(name)),
+                File(f))
+
+
+def replace_image(old, new):
+    """Переключает посты с картинки old на new и сбрасывает их ленты."""
+    posts = list(Post.objects.filter(image=old)
+                 .values_list('id', 'author_id', 'group_id'))
+    # modified входит в ключ кэша карточки (posts.cards) и в Last-Modified
+    # страницы поста. Пост, которому за это время сменили картинку, не
+    # подходит под фильтр и не меняется.
+    Post.objects.filter(image=old).update(image=new, modified=timezone.now())
+    for post_id, author_id, group_id in posts:
+        feed_cache.bump(feed_cache.post_scope(post_id),
+                        *feed_cache.post_scopes(author_id, group_id))
+
+
+def ingest(name):
+    try:
+        normalized = normalize(name)
+    except FileNotFoundError:
+        # Картинку уже заменили или удалили вместе с постом.
+        return
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', name)
+        normalized = None
+    if normalized is not None and normalized != name:
+        replace_image(name, normalized)
+        name = normalized
+    thumbnails.schedule_post_image(name)
+
+
+def schedule_ingest(name):
+    thumbnails.submit(ingest, name)
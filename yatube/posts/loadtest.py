@@ -0,0 +1,348 @@
+"""Нагрузочный стенд для команды loadtest.
+
+Приложение из yatube.wsgi запускается в нескольких процессах, которые
+принимают соединения с общего сокета (как prefork-сервер), а виртуальные
+пользователи в потоках выполняют сценарии по маршрутам posts.urls и
+users.urls. Каждый запрос замеряется и записывается под именем маршрута.
+"""
+import http.client
+import math
+import multiprocessing
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.urls import Resolver404, resolve, reverse
+
+from . import activity, counters
+from .benchmarks import seed_posts
+from .models import Comment, Follow, Group, Post, User
+from .search import backend as search_backend
+
+PASSWORD = 'load-test-Passw0rd'
+SEARCH_WORDS = ('Пост', 'номер', 'группа', 'комментарий', 'нагрузка')
+# Картинка 1x1 для создания постов.
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21'
+             b'\xf9\x04\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00'
+             b'\x01\x00\x00\x02\x02\x4c\x01\x00\x3b')
+
+
+class LoadTestServer(WSGIServer):
+    request_queue_size = 128
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_server(workers, host='127.0.0.1'):
+    """Поднимает сервер на свободном порту и форкает workers процессов."""
+    from yatube.wsgi import application
+
+    server = make_server(host, 0, application, server_class=LoadTestServer,
+                         handler_class=QuietHandler)
+    # Соединения с базой не должны переходить в дочерние процессы.
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=server.serve_forever, daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    return server, processes
+
+
+def stop_server(server, processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+    server.server_close()
+
+
+def seed(users, posts_per_user, groups, comments_per_post):
+    """Наполняет базу; возвращает имена пользователей и id постов."""
+    Group.objects.bulk_create(
+        Group(title=f'Группа {i}', slug=f'group-{i}',
+              description='Группа для нагрузки') for i in range(groups))
+    groups = list(Group.objects.all())
+    # Один хеш на всех: create_user считал бы PBKDF2 для каждого.
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(User(username=f'load{i}', password=password)
+                             for i in range(users))
+    authors = list(User.objects.filter(username__startswith='load'))
+    for i, author in enumerate(authors):
+        seed_posts(posts_per_user, author, group=groups[i % len(groups)])
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    Comment.objects.bulk_create(
+        Comment(post_id=post_id, author=random.choice(authors),
+                text='Комментарий')
+        for post_id in post_ids for _ in range(comments_per_post))
+    for author in authors:
+        for other in random.sample(authors, min(5, len(authors))):
+            if other != author:
+                Follow.objects.create(user=author, author=other)
+    counters.recount()
+    activity.refresh()
+    search_backend.rebuild()
+    return {
+        'usernames': [author.username for author in authors],
+        'groups': [group.slug for group in groups],
+        'posts': post_ids,
+        'own_posts': {author.username: list(
+            author.posts.values_list('id', flat=True)[:20])
+            for author in authors},
+    }
+
+
+def route_name(method, path):
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return f'{method} {path}'
+    return f'{method} {match.view_name}'
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; '
+                     f'name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content, content_type) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; '
+                     f'name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n'.encode()
+                     + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Stats:
+    """Замеры всех потоков: задержки и коды ответов по маршрутам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        # Маршрут -> код ответа -> число; None — соединение не удалось.
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, route, elapsed, status):
+        with self.lock:
+            self.latencies[route].append(elapsed)
+            self.statuses[route][status] += 1
+
+    def report(self, duration):
+        routes = {route: summarize(latencies, self.statuses[route], duration)
+                  for route, latencies in sorted(self.latencies.items())}
+        everything = [value for latencies in self.latencies.values()
+                      for value in latencies]
+        statuses = defaultdict(int)
+        for counts in self.statuses.values():
+            for status, number in counts.items():
+                statuses[status] += number
+        return routes, summarize(everything, statuses, duration)
+
+
+def percentile(ordered, q):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    index = max(0, min(len(ordered) - 1,
+                       math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, statuses, duration):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': sum(number for status, number in statuses.items()
+                      if status is None or status >= 500),
+        # Отказы core.throttle — не ошибки, но и не обработанные записи.
+        'throttled': statuses.get(429, 0),
+        'statuses': {str(status): number
+                     for status, number in sorted(
+                         statuses.items(), key=lambda item: str(item[0]))},
+        'rps': round(len(ordered) / duration, 2),
+        **{f'p{q}_ms': round(percentile(ordered, q) * 1000, 2)
+           for q in (50, 95, 99)},
+    }
+
+
+class Session:
+    """Виртуальный пользователь: свои cookie и токен CSRF."""
+
+    def __init__(self, address, stats):
+        self.address = address
+        self.stats = stats
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, fields=None, files=None):
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{name}={morsel.value}'
+                for name, morsel in self.cookies.items())
+        body = None
+        if fields is not None:
+            fields = dict(fields)
+            if 'csrftoken' in self.cookies:
+                fields['csrfmiddlewaretoken'] = self.cookies['csrftoken'].value
+            if files:
+                body, headers['Content-Type'] = encode_multipart(fields,
+                                                                 files)
+            else:
+                body = urlencode(fields).encode()
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        connection = http.client.HTTPConnection(*self.address, timeout=60)
+        started = time.perf_counter()
+        status, location = None, None
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            location = response.getheader('Location')
+            for header in response.msg.get_all('Set-Cookie') or ():
+                self.cookies.load(header)
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            connection.close()
+        self.stats.add(route_name(method, path),
+                       time.perf_counter() - started, status)
+        return status, location
+
+    def get(self, path, **params):
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        return self.request('GET', path)
+
+    def post(self, path, fields, files=None):
+        return self.request('POST', path, fields, files)
+
+    def login(self, username):
+        self.get(reverse('users:login'))
+        self.post(reverse('users:login'),
+                  {'username': username, 'password': PASSWORD})
+
+
+class Scenarios:
+    """Сценарии нагрузки; каждый принимает сессию своего потока."""
+
+    def __init__(self, data, rng):
+        self.data = data
+        self.rng = rng
+
+    def post_url(self, name='posts:post_detail', post_id=None):
+        return reverse(name, kwargs={
+            'post_id': post_id or self.rng.choice(self.data['posts'])})
+
+    def profile_url(self, name='posts:profile'):
+        return reverse(name, kwargs={
+            'username': self.rng.choice(self.data['usernames'])})
+
+    def anonymous(self, session, username):
+        rng = self.rng
+        session.get(reverse('posts:index'))
+        session.get(reverse('posts:index'), page=rng.randint(2, 5))
+        session.get(reverse('posts:group_list', kwargs={
+            'slug': rng.choice(self.data['groups'])}))
+        session.get(self.profile_url())
+        session.get(self.post_url())
+        session.get(self.post_url('posts:comments_more'))
+        session.get(reverse('posts:search'), q=rng.choice(SEARCH_WORDS))
+        if rng.random() < 0.2:
+            session.get(reverse('users:signup'))
+            session.get(reverse('users:login'))
+
+    def logged_in(self, session, username):
+        session.get(reverse('posts:follow_index'))
+        session.get(reverse('posts:index'))
+        session.get(self.profile_url())
+        session.get(self.post_url())
+        if self.rng.random() < 0.3:
+            session.get(self.profile_url('posts:profile_follow'))
+            session.get(self.profile_url('posts:profile_unfollow'))
+
+    def create_post(self, session, username):
+        session.get(reverse('posts:post_create'))
+        fields = {'text': f'Пост под нагрузкой {uuid.uuid4().hex[:8]}',
+                  'group': ''}
+        files = {'image': (f'{uuid.uuid4().hex}.gif', SMALL_GIF,
+                           'image/gif')}
+        status, location = session.post(reverse('posts:post_create'),
+                                        fields, files)
+        if location:
+            session.get(location)
+        own_posts = self.data['own_posts'].get(username)
+        if own_posts:
+            url = self.post_url('posts:post_edit', self.rng.choice(own_posts))
+            session.get(url)
+            session.post(url, {'text': 'Исправлено под нагрузкой'})
+
+    def comment(self, session, username):
+        post_id = self.rng.choice(self.data['posts'])
+        session.get(self.post_url(post_id=post_id))
+        session.post(self.post_url('posts:add_comment', post_id),
+                     {'text': 'Комментарий под нагрузкой'})
+        session.get(self.post_url(post_id=post_id))
+
+    def signup(self, session, username):
+        session.get(reverse('users:signup'))
+        name = f'new{uuid.uuid4().hex[:12]}'
+        session.post(reverse('users:signup'), {
+            'username': name, 'first_name': 'Нагрузка', 'last_name': 'Тест',
+            'email': f'{name}@example.com',
+            'password1': PASSWORD, 'password2': PASSWORD})
+        session.get(reverse('users:logout'))
+
+    # Сценарий -> нужен ли вход.
+    LOGIN_REQUIRED = {'anonymous': False, 'logged_in': True,
+                      'create_post': True, 'comment': True, 'signup': False}
+
+
+def run_users(address, data, mix, concurrency, duration, seed=None):
+    """Запускает concurrency виртуальных пользователей на duration секунд."""
+    stats = Stats()
+    deadline = time.monotonic() + duration
+    names, weights = zip(*mix.items())
+
+    def user(number):
+        rng = random.Random(None if seed is None else seed + number)
+        scenarios = Scenarios(data, rng)
+        username = data['usernames'][number % len(data['usernames'])]
+        guest = Session(address, stats)
+        member = Session(address, stats)
+        member.login(username)
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            session = member if Scenarios.LOGIN_REQUIRED[name] else guest
+            getattr(scenarios, name)(session, username)
+
+    threads = [threading.Thread(target=user, args=(number,))
+               for number in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.monotonic() - started
+
+
+def parse_mix(value):
+    """'anonymous=50,comment=10' -> {'anonymous': 50, 'comment': 10}."""
+    mix = {}
+    for item in filter(None, re.split(r'\s*,\s*', value)):
+        name, _, weight = item.partition('=')
+        if name not in Scenarios.LOGIN_REQUIRED:
+            raise ValueError(f'Неизвестный сценарий: {name}')
+        mix[name] = float(weight or 1)
+    return mix
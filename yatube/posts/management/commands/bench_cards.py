@@ -0,0 +1,91 @@
+import copy
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts import feed_cache
+from posts.benchmarks import temporary_database
+from posts.models import Group, User
+from posts.seeding import DatasetSeeder
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает отрисовку страниц лент без кэша карточек постов и с '
+            'ним. Фрагмент ленты сбрасывается перед каждым запросом, как '
+            'после публикации нового поста.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--images', type=float, default=0.3,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Прогрев строит миниатюры и превышает бюджет запросов.
+        logging.getLogger('core.query_budget').setLevel(logging.ERROR)
+        # Шаблоны компилируются один раз, как при DEBUG = False.
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['APP_DIRS'] = False
+        templates[0]['OPTIONS']['loaders'] = [(
+            'django.template.loaders.cached.Loader',
+            ['django.template.loaders.filesystem.Loader',
+             'django.template.loaders.app_directories.Loader'])]
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(MEDIA_ROOT=os.path.join(directory,
+                                                          'media'),
+                                  THUMBNAIL_WORKERS=0,
+                                  TEMPLATES=templates), \
+                temporary_database():
+            cache.clear()
+            seeder = DatasetSeeder(seed=0)
+            seeder.users(max(1, options['posts'] // 100))
+            seeder.groups(5)
+            seeder.posts(options['posts'], options['images'])
+            seeder.finish()
+            group = Group.objects.annotate(
+                total=Count('posts')).order_by('-total').first()
+            author = User.objects.annotate(
+                total=Count('posts')).order_by('-total').first()
+            pages = [
+                ('index', reverse('posts:index'), feed_cache.INDEX),
+                ('group_list', reverse('posts:group_list',
+                                       kwargs={'slug': group.slug}),
+                 feed_cache.group_scope(group.pk)),
+                ('profile', reverse('posts:profile',
+                                    kwargs={'username': author.username}),
+                 feed_cache.author_scope(author.pk)),
+            ]
+            client = Client()
+            self.stdout.write(f'{"страница":<12} {"без кэша":>12} '
+                              f'{"с кэшем":>12} {"экономия":>12}  '
+                              f'(мс процессора на запрос)')
+            for name, url, scope in pages:
+                # Без срока жизни карточки сразу устаревают. Прогрев в том
+                # же режиме строит миниатюры, но карточек не оставляет.
+                with override_settings(POST_CARD_TIMEOUT=0):
+                    client.get(url)
+                    cold = self.measure(client, url, scope,
+                                        options['repeat'])
+                warm = self.measure(client, url, scope, options['repeat'])
+                self.stdout.write(f'{name:<12} {cold:>12.2f} {warm:>12.2f} '
+                                  f'{cold - warm:>12.2f}')
+            cache.clear()
+
+    def measure(self, client, url, scope, repeat):
+        timings = []
+        for _ in range(repeat):
+            feed_cache.bump(scope)
+            started = time.process_time()
+            client.get(url)
+            timings.append((time.process_time() - started) * 1000)
+        return statistics.median(timings)
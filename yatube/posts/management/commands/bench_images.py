@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.benchmarks import (fix_mmap_threshold, measure, measure_memory,
+                              temporary_database)
+from posts.images import ORIENTATION, normalize
+from posts.models import Post, User
+
+# Вариант приёма загрузки -> настройки.
+UPLOADS = {
+    # Так Django ведёт себя с файлами меньше FILE_UPLOAD_MAX_MEMORY_SIZE.
+    'в памяти': {'FILE_UPLOAD_HANDLERS': [
+        'django.core.files.uploadhandler.MemoryFileUploadHandler',
+        'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+    ], 'FILE_UPLOAD_MAX_MEMORY_SIZE': 2 ** 30},
+    'во временный файл': {},
+}
+MB = 2 ** 20
+
+
+def make_photo(path, size_mb):
+    """JPEG из шума примерно на size_mb МБ, повёрнутый через EXIF, как
+    снимок с телефона."""
+    # Шум при quality=92 занимает около байта на пиксель.
+    height = int((size_mb * MB * 3 / 4) ** 0.5)
+    width = height * 4 // 3
+    image = Image.frombytes('RGB', (width, height),
+                            os.urandom(width * height * 3))
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    image.save(path, 'JPEG', quality=92, exif=exif)
+    return image.size
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время и память загрузки фотографии через post_create '
+            'и её фоновой обработки (поворот и уменьшение).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=float, default=20)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if not fix_mmap_threshold():
+            self.stderr.write('RSS может занижаться: порог mmap не задан.')
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(MEDIA_ROOT=os.path.join(directory,
+                                                          'media')), \
+                temporary_database():
+            source = os.path.join(directory, 'photo.jpg')
+            width, height = make_photo(source, options['size_mb'])
+            self.stdout.write(
+                f'Фотография {width}×{height}, '
+                f'{os.path.getsize(source) / MB:.1f} МБ')
+            self.bench_request(source, options['repeat'])
+            self.bench_ingest(source, directory, options['repeat'])
+
+    def report(self, title, ms, memory):
+        python_peak, rss_peak = memory
+        rss = '—' if rss_peak is None else f'{rss_peak / MB:7.1f} МБ'
+        self.stdout.write(f'  {title:<22} {ms:9.1f} мс, Python '
+                          f'{python_peak / MB:7.1f} МБ, RSS {rss}')
+
+    def bench_request(self, source, repeat):
+        client = Client()
+        client.force_login(User.objects.create_user(username='author'))
+        url = reverse('posts:post_create')
+
+        def upload():
+            with open(source, 'rb') as image:
+                response = client.post(url, {'text': 'Фото',
+                                             'image': image})
+            assert response.status_code == 302, response.status_code
+            assert Post.objects.latest('id').image, 'картинка не сохранилась'
+
+        self.stdout.write('Запрос (клиент сам держит тело в памяти):')
+        # Фоновая обработка замеряется отдельно.
+        with mock.patch('posts.images.schedule_ingest'):
+            for title, upload_settings in UPLOADS.items():
+                with override_settings(**upload_settings):
+                    ms, _ = measure(upload, repeat)
+                    self.report(title, ms, measure_memory(upload))
+
+    def bench_ingest(self, source, directory, repeat):
+        name = 'posts/bench.jpg'
+        path = os.path.join(directory, 'media', name)
+
+        def ingest():
+            shutil.copyfile(source, path)
+            normalize(name)
+
+        def decode():
+            with Image.open(source) as image:
+                image.load()
+
+        self.stdout.write('Фоновая обработка:')
+        for title, func in (('полное декодирование', decode),
+                            ('normalize', ingest)):
+            ms, _ = measure(func, repeat)
+            self.report(title, ms, measure_memory(func))
+        with Image.open(path) as image:
+            self.stdout.write(
+                f'Сохранено {image.size[0]}×{image.size[1]}, '
+                f'{os.path.getsize(path) / MB:.1f} МБ')
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from posts.benchmarks import measure, seed_posts, temporary_database
+from posts.models import Post, User
+from posts.utils import CURSOR_ORDERING, CursorPaginator
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает OFFSET-пагинацию и курсорную пагинацию ленты '
+            'на временной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', nargs='+', type=int,
+                            default=[1, 1000, 50000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        per_page = settings.NUM_OF_POSTS
+        total = max(options['pages']) * per_page
+        with temporary_database():
+            author = User.objects.create_user(username='bench')
+            self.stdout.write(f'Создаём {total} постов...')
+            seed_posts(total, author)
+            posts = Post.objects.select_related('group')
+            self.stdout.write(f'{"страница":>10} {"offset, мс":>12} '
+                              f'{"cursor, мс":>12} {"запросов":>10}')
+            for number in options['pages']:
+                offset_ms, offset_queries = measure(
+                    lambda: list(Paginator(posts, per_page).get_page(number)),
+                    options['repeat'])
+                after = None
+                if number > 1:
+                    after = list(posts.order_by(*CURSOR_ORDERING).values_list(
+                        'pub_date', 'id')[(number - 1) * per_page - 1])
+                cursor_ms, cursor_queries = measure(
+                    lambda: list(CursorPaginator(posts, per_page)
+                                 .page(after=after)),
+                    options['repeat'])
+                self.stdout.write(
+                    f'{number:>10} {offset_ms:>12.2f} {cursor_ms:>12.2f} '
+                    f'{offset_queries:>4} / {cursor_queries:<4}'
+                )
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template import Template
+from django.template.context import Context
+from django.template.loader import render_to_string
+
+from posts.utils import FeedPaginator
+
+# Прежний вариант списка страниц: ссылка на каждую страницу ленты.
+FULL_PAGE_RANGE = Template(
+    '{% for i in page_obj.paginator.page_range %}'
+    '{% if page_obj.number == i %}<li class="page-item active">'
+    '<span class="page-link">{{ i }}</span></li>'
+    '{% else %}<li class="page-item">'
+    '<a class="page-link" href="?page={{ i }}">{{ i }}</a></li>'
+    '{% endif %}{% endfor %}'
+)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет рендер списка страниц на синтетической ленте: '
+            'полный page_range против оконного.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=500000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _run(self, render, repeat):
+        best, size = None, 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            size = len(render())
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, size
+
+    def handle(self, *args, **options):
+        feed = range(options['posts'])
+        number = FeedPaginator(feed, settings.NUM_OF_POSTS).num_pages // 2
+        full_page = Paginator(feed, settings.NUM_OF_POSTS).page(number)
+        elided_page = FeedPaginator(feed, settings.NUM_OF_POSTS).page(number)
+        full_ms, full_size = self._run(
+            lambda: FULL_PAGE_RANGE.render(Context({'page_obj': full_page})),
+            options['repeat'])
+        elided_ms, elided_size = self._run(
+            lambda: render_to_string('posts/includes/paginator.html',
+                                     {'page_obj': elided_page}),
+            options['repeat'])
+        self.stdout.write(f'Постов: {options["posts"]}, страница {number}')
+        self.stdout.write(f'page_range: {full_ms:9.2f} мс, '
+                          f'{full_size} байт')
+        self.stdout.write(f'окно:       {elided_ms:9.2f} мс, '
+                          f'{elided_size} байт')
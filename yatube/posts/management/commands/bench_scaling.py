@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from posts.benchmarks import temporary_database
+from posts.models import Follow, Group, Post, User
+from posts.seeding import DatasetSeeder
+
+# Во сколько раз может вырасти время ответа между крайними размерами,
+# прежде чем представление считается зависящим от объёма данных.
+GROWTH_LIMIT = 2.0
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа и число запросов каждого представления '
+            'posts на растущем объёме данных (по умолчанию 1k, 100k и 1M '
+            'постов) и отмечает те, что растут вместе с базой, а не с '
+            'размером страницы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[1000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='JSON с результатами.')
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        results = {}
+        budget_logger = logging.getLogger('core.query_budget')
+        level = budget_logger.level
+        # Предупреждения о бюджете запросов на каждом замере только мешают.
+        budget_logger.setLevel(logging.ERROR)
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(MEDIA_ROOT=os.path.join(directory,
+                                                          'media')), \
+                temporary_database(os.path.join(directory, 'db.sqlite3')):
+            try:
+                seeder = DatasetSeeder(seed=options['seed'],
+                                       log=lambda message: None)
+                for size in sizes:
+                    self.grow(seeder, size)
+                    results[size] = self.measure_views(options['repeat'])
+            finally:
+                budget_logger.setLevel(level)
+                cache.clear()
+        self.print_table(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+    def grow(self, seeder, size):
+        """Досыпает данные до size постов, сохраняя пропорции."""
+        started = time.perf_counter()
+        users = max(1, size // 20) - User.objects.count()
+        groups = max(1, size // 2000) - Group.objects.count()
+        posts = size - Post.objects.count()
+        seeder.users(max(0, users))
+        seeder.groups(max(0, groups))
+        seeder.posts(max(0, posts))
+        seeder.comments(max(0, posts // 2))
+        seeder.follows(max(0, users * 10))
+        seeder.finish()
+        self.stdout.write(
+            f'{size} постов: наполнение {time.perf_counter() - started:.1f} с')
+
+    def targets(self):
+        """Самые тяжёлые объекты: крупнейшая группа, самый пишущий автор,
+        самый обсуждаемый пост и самый подписанный читатель."""
+        group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        author = User.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        post = Post.objects.annotate(
+            total=Count('comments')).order_by('-total').first()
+        reader_id = Follow.objects.values('user').annotate(
+            total=Count('id')).order_by('-total')[0]['user']
+        deep_page = max(1, Post.objects.count()
+                        // settings.NUM_OF_POSTS // 2)
+        return {
+            'index': (reverse('posts:index'), {}),
+            'index (середина)': (reverse('posts:index'),
+                                 {'page': deep_page}),
+            'group_list': (reverse('posts:group_list',
+                                   kwargs={'slug': group.slug}), {}),
+            'profile': (reverse('posts:profile',
+                                kwargs={'username': author.username}), {}),
+            'post_detail': (reverse('posts:post_detail',
+                                    kwargs={'post_id': post.pk}), {}),
+            'comments_more': (reverse('posts:comments_more',
+                                      kwargs={'post_id': post.pk}), {}),
+            'follow_index': (reverse('posts:follow_index'), {}),
+            'search': (reverse('posts:search'),
+                       {'q': post.text.split()[0]}),
+            'post_create': (reverse('posts:post_create'), {}),
+        }, User.objects.get(pk=reader_id)
+
+    def measure_views(self, repeat):
+        targets, reader = self.targets()
+        client = Client()
+        client.force_login(reader)
+        results = {}
+        for name, (url, params) in targets.items():
+            timings = []
+            for _ in range(repeat):
+                # Каждый замер — промах кэша: считаем работу базы.
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(url, params)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    self.stderr.write(f'{name}: {response.status_code}')
+            results[name] = {'ms': round(statistics.median(timings), 2),
+                             'queries': len(queries)}
+        return results
+
+    def print_table(self, results):
+        sizes = list(results)
+        header = f'{"представление":<18}' + ''.join(
+            f' {size:>10} {"запр.":>5}' for size in sizes) + '     рост'
+        self.stdout.write(header)
+        for name in results[sizes[0]]:
+            rows = [results[size][name] for size in sizes]
+            line = f'{name:<18}' + ''.join(
+                f' {row["ms"]:>8.1f}мс {row["queries"]:>5}' for row in rows)
+            growth = rows[-1]['ms'] / max(rows[0]['ms'], 0.001)
+            line += f' {growth:>7.1f}x'
+            if (len(rows) > 1 and growth > GROWTH_LIMIT
+                    or rows[-1]['queries'] > rows[0]['queries']):
+                line = self.style.WARNING(line + '  растёт с базой')
+            self.stdout.write(line)
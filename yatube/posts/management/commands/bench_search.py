@@ -0,0 +1,47 @@
+import random
+import string
+
+from django.core.management.base import BaseCommand
+
+from posts.benchmarks import measure, seed_posts, temporary_database
+from posts.models import Post, User
+from posts.search import IContainsBackend, SQLiteFTS5Backend
+
+WORDS_PER_POST = 12
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск через icontains и через индекс FTS5 '
+            'на синтетических постах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--vocabulary', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(42)
+        vocabulary = [''.join(rnd.choices(string.ascii_lowercase, k=8))
+                      for _ in range(options['vocabulary'])]
+
+        def text(i):
+            return ' '.join(rnd.choices(vocabulary, k=WORDS_PER_POST))
+
+        with temporary_database():
+            author = User.objects.create_user(username='bench')
+            self.stdout.write(f'Создаём {options["posts"]} постов...')
+            seed_posts(options['posts'], author, text=text)
+            fts = SQLiteFTS5Backend()
+            fts.rebuild()
+            # Редкое слово из словаря и слово, которого нет ни в одном посте.
+            queries = (vocabulary[0], 'zzzzzzzz')
+            icontains = IContainsBackend()
+            for query in queries:
+                like_ms, _ = measure(
+                    lambda: list(icontains.filter(Post.objects, query)
+                                 .order_by('-pub_date')[:10]),
+                    options['repeat'])
+                fts_ms, _ = measure(lambda: fts.search(query, limit=10),
+                                    options['repeat'])
+                self.stdout.write(f'{query}: icontains {like_ms:9.2f} мс, '
+                                  f'FTS5 {fts_ms:9.2f} мс')
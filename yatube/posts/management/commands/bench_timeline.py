@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.test.utils import override_settings
+
+from posts.benchmarks import measure, seed_posts, temporary_database
+from posts.counters import recount
+from posts.models import Follow, Post, User
+from posts.timeline import TimelinePaginator
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ленту подписок: JOIN по подпискам, слияние при '
+            'чтении и материализованную ленту.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--posts-per-author', type=int, default=50)
+        parser.add_argument('--followers', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        per_page = settings.NUM_OF_POSTS
+        with temporary_database():
+            reader = User.objects.create_user(username='reader')
+            User.objects.bulk_create(User(username=f'author{i}')
+                                     for i in range(options['authors']))
+            authors = list(User.objects.exclude(pk=reader.pk))
+            self.stdout.write(
+                f'Создаём {len(authors)} авторов по '
+                f'{options["posts_per_author"]} постов...')
+            for author in authors:
+                seed_posts(options['posts_per_author'], author)
+            # Подписки создаются по одной, чтобы сработала раскладка.
+            for author in authors:
+                Follow.objects.create(user=reader, author=author)
+
+            naive = Post.objects.filter(
+                author__following__user=reader).select_related('author')
+            rows = [
+                ('JOIN + OFFSET', lambda: list(
+                    Paginator(naive, per_page).get_page(1))),
+                ('слияние при чтении', lambda: list(
+                    TimelinePaginator(reader, per_page,
+                                      merge_all=True).page())),
+                ('материализованная', lambda: list(
+                    TimelinePaginator(reader, per_page).page())),
+            ]
+            self.stdout.write('Чтение первой страницы ленты:')
+            for title, func in rows:
+                ms, queries = measure(func, options['repeat'])
+                self.stdout.write(f'  {title:<20} {ms:9.2f} мс, '
+                                  f'{queries} запросов')
+
+            star = User.objects.create_user(username='star')
+            User.objects.bulk_create(User(username=f'fan{i}')
+                                     for i in range(options['followers']))
+            Follow.objects.bulk_create(
+                Follow(user=user, author=star)
+                for user in User.objects.filter(username__startswith='fan'))
+            recount()
+            self.stdout.write(
+                f'Публикация поста автором с {options["followers"]} '
+                f'подписчиками:')
+            for title, limit in (('с раскладкой', options['followers']),
+                                 ('без раскладки', -1)):
+                with override_settings(TIMELINE_FANOUT_LIMIT=limit):
+                    ms, queries = measure(
+                        lambda: Post.objects.create(text='Пост', author=star),
+                        options['repeat'])
+                self.stdout.write(f'  {title:<20} {ms:9.2f} мс, '
+                                  f'{queries} запросов')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts.media_gc import BATCH_SIZE, MediaCollector
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки, на которые не ссылается ни один пост, их '
+            'миниатюры и записи sorl-thumbnail, а также миниатюры без '
+            'записей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, ничего не удаляя.')
+        parser.add_argument('--min-age', type=int, default=60 * 60,
+                            help='Файлы моложе стольких секунд не трогать.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        log = None
+        if options['verbosity'] > 1:
+            log = self.stdout.write
+        stats = MediaCollector(dry_run=options['dry_run'],
+                               min_age=options['min_age'],
+                               batch_size=options['batch_size'],
+                               log=log).collect()
+        verb = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено картинок: {stats["images"]}, миниатюр: '
+            f'{stats["thumbnails"]}. {verb} картинок: '
+            f'{stats["orphan_images"]}, миниатюр: '
+            f'{stats["orphan_thumbnails"]}, записей kvstore: '
+            f'{stats["kvstore_rows"]}, '
+            f'{stats["bytes"] / 2 ** 20:.1f} МБ.'))
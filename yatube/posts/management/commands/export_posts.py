@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import EXPORTS, MODELS, Checkpoint, Throughput, dump
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает группы, посты, комментарии и подписки '
+            'в файл JSON Lines.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output')
+        parser.add_argument('--models', nargs='+', choices=MODELS,
+                            default=list(MODELS))
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл состояния: при повторном запуске выгрузка '
+                 'продолжится с последнего сохранённого id.')
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(options['checkpoint'])
+        chunk_size = options['chunk_size']
+        throughput = Throughput(self.stdout)
+        mode = 'r+b' if checkpoint.get('offset') is not None else 'wb'
+        with open(options['output'], mode) as out:
+            # Всё, что записано после последнего checkpoint, отбрасывается.
+            out.seek(checkpoint.get('offset', 0))
+            out.truncate()
+            for model in options['models']:
+                queryset, fields, _ = EXPORTS[model]
+                rows = (queryset.filter(id__gt=checkpoint.get(model, 0))
+                        .order_by('id').values_list(*fields)
+                        .iterator(chunk_size=chunk_size))
+                written = 0
+                last_id = None
+                for row in rows:
+                    out.write(dump(model, row).encode() + b'\n')
+                    last_id = row[0]
+                    written += 1
+                    if written % chunk_size == 0:
+                        out.flush()
+                        checkpoint.save(**{model: last_id},
+                                        offset=out.tell())
+                        throughput.add(chunk_size)
+                out.flush()
+                if last_id is not None:
+                    checkpoint.save(**{model: last_id}, offset=out.tell())
+                throughput.add(written % chunk_size)
+        throughput.add(0, force=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено строк: {throughput.rows}'))
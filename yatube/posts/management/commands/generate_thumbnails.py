@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from sorl.thumbnail import default
+
+from posts.models import Post
+from posts.thumbnails import missing_geometries
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры для картинок существующих постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def _generate(self, name):
+        try:
+            built = 0
+            for geometry_string, options in missing_geometries(name):
+                default.backend.generate(name, geometry_string, **options)
+                built += 1
+            return built
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        names = (Post.objects.exclude(image='').order_by()
+                 .values_list('image', flat=True).distinct()
+                 .iterator(chunk_size=options['chunk_size']))
+        images = thumbnails = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for built in pool.map(self._generate, names):
+                images += 1
+                thumbnails += built
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок проверено: {images}, миниатюр построено: '
+            f'{thumbnails}'))
@@ -0,0 +1,114 @@
+import datetime
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from posts.benchmarks import temporary_database
+from posts.loadtest import (parse_mix, run_users, seed, start_server,
+                            stop_server)
+
+DEFAULT_MIX = 'anonymous=50,logged_in=25,comment=12,create_post=10,signup=3'
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон всех маршрутов posts и users на временной '
+            'базе и с временным кэшем: p50/p95/p99 и запросы в секунду по '
+            'маршрутам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Процессов сервера.')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Виртуальных пользователей.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность прогона, секунды.')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help='Веса сценариев: anonymous, logged_in, '
+                                 'comment, create_post, signup.')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--posts-per-user', type=int, default=40)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--comments-per-post', type=int, default=2)
+        parser.add_argument('--throttle', action='store_true',
+                            help='Оставить лимиты THROTTLE_RATES: все '
+                                 'пользователи стенда приходят с одного IP, '
+                                 'и записи в основном получают 429.')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Зерно случайных сценариев.')
+        parser.add_argument('--output',
+                            help='JSON с результатами; по умолчанию '
+                                 'loadtest-<время>.json.')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения.')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error) from error
+        started_at = datetime.datetime.now()
+        output = options['output'] or started_at.strftime(
+            'loadtest-%Y%m%d-%H%M%S.json')
+        limits = {}
+        if not options['throttle']:
+            limits['THROTTLE_RATES'] = {}
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(MEDIA_ROOT=os.path.join(directory,
+                                                          'media'),
+                                  **limits), \
+                temporary_database(os.path.join(directory, 'db.sqlite3')):
+            self.stdout.write('Наполняем базу...')
+            data = seed(options['users'], options['posts_per_user'],
+                        options['groups'], options['comments_per_post'])
+            server, processes = start_server(options['workers'])
+            self.stdout.write(
+                f'Сервер на {server.server_address[0]}:'
+                f'{server.server_address[1]}, процессов: '
+                f'{options["workers"]}; нагрузка {options["duration"]} с...')
+            try:
+                stats, duration = run_users(
+                    server.server_address, data, mix,
+                    options['concurrency'], options['duration'],
+                    options['seed'])
+            finally:
+                stop_server(server, processes)
+
+        routes, total = stats.report(duration)
+        result = {
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'duration': round(duration, 2),
+            'workers': options['workers'],
+            'concurrency': options['concurrency'],
+            'mix': mix,
+            'throttle': options['throttle'],
+            'total': total,
+            'routes': routes,
+        }
+        with open(output, 'w') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)['routes']
+        self.print_table(routes, total, previous)
+        self.stdout.write(self.style.SUCCESS(f'Результаты: {output}'))
+
+    def print_table(self, routes, total, previous=None):
+        header = (f'{"маршрут":<34} {"запросов":>8} {"ошибок":>6} '
+                  f'{"429":>6} {"rps":>8} {"p50":>8} {"p95":>8} {"p99":>8}')
+        if previous is not None:
+            header += f' {"Δp95":>8} {"Δrps":>8}'
+        self.stdout.write(header)
+        for route, row in [*routes.items(), ('всего', total)]:
+            line = (f'{route:<34} {row["requests"]:>8} {row["errors"]:>6} '
+                    f'{row.get("throttled", 0):>6} {row["rps"]:>8.1f} '
+                    f'{row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} '
+                    f'{row["p99_ms"]:>8.1f}')
+            if previous is not None and route in previous:
+                old = previous[route]
+                line += (f' {row["p95_ms"] - old["p95_ms"]:>+8.1f}'
+                         f' {row["rps"] - old["rps"]:>+8.1f}')
+            self.stdout.write(line)
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.seeding import seed_dataset
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками со скошенным '
+            'распределением. Данные добавляются к уже существующим.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=None,
+                            help='По умолчанию один автор на 20 постов.')
+        parser.add_argument('--groups', type=int, default=None,
+                            help='По умолчанию одна группа на 2000 постов.')
+        parser.add_argument('--comments', type=int, default=None,
+                            help='По умолчанию половина числа постов.')
+        parser.add_argument('--follows', type=int, default=None,
+                            help='По умолчанию по 10 на пользователя.')
+        parser.add_argument('--images', type=float, default=0.0,
+                            help='Доля постов с картинкой, от 0 до 1.')
+        parser.add_argument('--password', default=None,
+                            help='Пароль всех пользователей; по умолчанию '
+                                 'вход невозможен.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        posts = options['posts']
+        users = options['users'] or max(1, posts // 20)
+        groups = options['groups']
+        if groups is None:
+            groups = max(1, posts // 2000)
+        comments = options['comments']
+        if comments is None:
+            comments = posts // 2
+        follows = options['follows']
+        if follows is None:
+            follows = users * 10
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images должно быть от 0 до 1.')
+        started = time.perf_counter()
+        seed_dataset(users, groups, posts, comments, follows,
+                     image_ratio=options['images'], seed=options['seed'],
+                     password=options['password'],
+                     log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с'))
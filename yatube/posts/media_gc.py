@@ -0,0 +1,161 @@
+"""Сборка мусора в MEDIA_ROOT: картинки без постов и их миниатюры.
+
+Картинка, которую заменили через post_edit или чей пост удалён, остаётся
+на диске вместе с миниатюрами и записями sorl-thumbnail. MediaCollector
+обходит каталог картинок через os.scandir и сверяет имена пачками по
+batch_size с Post.image (индекс post_image_idx), так что ни дерево
+файлов, ни список картинок целиком в память не попадают, а stat
+вызывается только для найденных сирот. У сироты удаляются файлы
+миниатюр и все записи kvstore — тоже пачками, без обхода kvstore по
+одной записи.
+
+Вторым проходом удаляются файлы миниатюр, о которых kvstore уже не
+знает. Файлы моложе min_age секунд не трогаются: новая картинка
+сохраняется на диск раньше, чем строка поста, а миниатюра — раньше, чем
+её запись в kvstore. Обход рассчитан на FileSystemStorage.
+"""
+import os
+import time
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from .models import Post
+from .thumbnails import source_image
+
+# Не больше лимита параметров запроса SQLite (999).
+BATCH_SIZE = 500
+
+
+def walk(directory):
+    """Имена файлов (относительно MEDIA_ROOT) в каталоге и подкаталогах."""
+    stack = [directory.strip('/')]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(settings.MEDIA_ROOT, current))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f'{current}/{entry.name}'
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class MediaCollector:
+    """Находит и удаляет сирот; в режиме dry_run только считает их.
+
+    stats: images и thumbnails — просмотрено файлов, orphan_images и
+    orphan_thumbnails — найдено сирот, bytes — сколько места они
+    занимают, kvstore_rows — сколько их записей в kvstore.
+    """
+
+    def __init__(self, dry_run=False, min_age=60 * 60,
+                 batch_size=BATCH_SIZE, log=None):
+        self.dry_run = dry_run
+        self.min_age = min_age
+        self.batch_size = min(batch_size, BATCH_SIZE)
+        self.log = log or (lambda message: None)
+        self.stats = Counter()
+
+    def collect(self):
+        self.collect_images()
+        self.collect_thumbnails()
+        return self.stats
+
+    def collect_images(self):
+        directory = Post._meta.get_field('image').upload_to
+        for batch in batches(walk(directory), self.batch_size):
+            self.stats['images'] += len(batch)
+            referenced = set(Post.objects.filter(image__in=batch)
+                             .values_list('image', flat=True))
+            orphans = self.expired(name for name in batch
+                                   if name not in referenced)
+            if orphans:
+                self.stats['orphan_images'] += len(orphans)
+                self.remove_thumbnails_of(orphans)
+                self.remove_files(orphans)
+
+    def collect_thumbnails(self):
+        directory = thumbnail_settings.THUMBNAIL_PREFIX
+        for batch in batches(walk(directory), self.batch_size):
+            self.stats['thumbnails'] += len(batch)
+            keys = {add_prefix(ImageFile(name, default.storage).key): name
+                    for name in batch}
+            known = set(KVStore.objects.filter(key__in=keys)
+                        .values_list('key', flat=True))
+            orphans = self.expired(name for key, name in keys.items()
+                                   if key not in known)
+            if orphans:
+                self.stats['orphan_thumbnails'] += len(orphans)
+                self.remove_files(orphans)
+
+    def expired(self, names):
+        """Имена старше min_age; их размер добавляется в stats."""
+        threshold = time.time() - self.min_age
+        old = []
+        for name in names:
+            try:
+                stat = os.stat(default_storage.path(name))
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime <= threshold:
+                old.append(name)
+                self.stats['bytes'] += stat.st_size
+        return old
+
+    def values(self, keys):
+        values = []
+        for batch in batches(keys, self.batch_size):
+            values += KVStore.objects.filter(key__in=batch).values_list(
+                'value', flat=True)
+        return values
+
+    def remove_thumbnails_of(self, names):
+        """Файлы миниатюр картинок names и все их записи kvstore."""
+        image_keys = [source_image(name).key for name in names]
+        list_keys = [add_prefix(key, 'thumbnails') for key in image_keys]
+        thumbnail_keys = [add_prefix(key) for value in self.values(list_keys)
+                          for key in deserialize(value)]
+        thumbnails = [deserialize_image_file(value).name
+                      for value in self.values(thumbnail_keys)]
+        thumbnails = self.expired(thumbnails)
+        self.stats['orphan_thumbnails'] += len(thumbnails)
+        self.remove_files(thumbnails)
+        rows = [add_prefix(key) for key in image_keys]
+        self.delete_rows(rows + list_keys + thumbnail_keys)
+
+    def delete_rows(self, keys):
+        for batch in batches(keys, self.batch_size):
+            rows = KVStore.objects.filter(key__in=batch)
+            if self.dry_run:
+                self.stats['kvstore_rows'] += rows.count()
+                continue
+            self.stats['kvstore_rows'] += rows.delete()[0]
+            default.kvstore.cache.delete_many(batch)
+
+    def remove_files(self, names):
+        for name in names:
+            self.log(name)
+            if not self.dry_run:
+                default_storage.delete(name)
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def fill_last_activity(apps, schema_editor):
+    from posts.activity import refresh
+    refresh(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Последняя активность'),
+        ),
+        migrations.RunPython(fill_last_activity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-last_activity', '-id'], name='post_group_activity_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -17,6 +18,8 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField('Текст поста', help_text='Введите текст поста')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    # Для Last-Modified страницы поста: pub_date при правке не меняется.
+    modified = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -37,14 +40,48 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # Публикация или последний комментарий: сортировка ленты группы по
+    # активности (posts.activity).
+    last_activity = models.DateTimeField('Последняя активность',
+                                         default=timezone.now,
+                                         editable=False)
 
     class Meta:
         ordering = ('-pub_date',)
+        # Ленты: общая, группы и автора — все по убыванию даты; id
+        # добавлен для курсорной пагинации (CURSOR_ORDERING).
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='post_pub_date_idx'),
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('group', '-last_activity', '-id'),
+                         name='post_group_activity_idx'),
+            # Сверка файлов с постами при сборке мусора (posts.media_gc).
+            models.Index(fields=('image',), name='post_image_idx'),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
-        return self.text[:settings.NUM_VIS_SYMB]
+        return self.text[:settings.NUMBER_VISIBLE_SYMBL]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # last_activity меняют только комментарии: правка поста не
+            # должна затирать время комментария, пришедшего после чтения.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'last_activity']
+        # Счётчики обновляются в post_save, в той же транзакции.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        # Обработчики post_save (posts.signals) уже сравнили новое
+        # состояние с прежним; следующее сохранение сравнивается с этим.
+        self._saved_group_id = self.group_id
+        self._saved_image = self.image.name
 
 
 class Comment(models.Model):
@@ -63,11 +100,22 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(fields=('post', '-created', '-id'),
+                         name='comment_post_created_idx'),
+            # Список и навигация по датам в админке.
+            models.Index(fields=('-created', '-id'),
+                         name='comment_created_idx'),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
     def __str__(self):
-        return self.text[:settings.NUM_VIS_SYMB]
+        return self.text[:settings.NUMBER_VISIBLE_SYMBL]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
 class Follow(models.Model):
@@ -81,3 +129,57 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='follow_unique_user_author'),
+        )
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя.
+
+    pub_date копируется из поста, чтобы лента читалась по индексу
+    без соединения с таблицей постов.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='timeline_user_pub_date_idx'),
+        )
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='timeline_unique_user_post'),
+        )
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Лента подписок'
+
+
+class Counter(models.Model):
+    """Денормализованный счётчик; ключи строятся в posts.counters."""
+    key = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик'
+        verbose_name_plural = 'Счётчики'
+
+    def __str__(self):
+        return f'{self.key} = {self.value}'
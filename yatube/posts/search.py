@@ -0,0 +1,195 @@
+"""Полнотекстовый поиск по постам.
+
+Бэкенд выбирается настройкой SEARCH_BACKEND. Индекс по тексту поста и
+названию группы обновляется сигналами при сохранении и удалении, а
+результаты упорядочены по релевантности и листаются курсором по паре
+(rank, id): чем меньше rank, тем выше пост в выдаче.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .utils import CursorPage, decode_raw_cursor
+
+SEARCH_ORDERING = ('search_rank', 'id')
+
+
+class SearchBackend:
+    """Интерфейс бэкенда поиска."""
+
+    def index(self, post):
+        """Добавляет или обновляет пост в индексе."""
+
+    def remove(self, post_id):
+        """Убирает пост из индекса."""
+
+    def update_group(self, group_id, title):
+        """Меняет название группы у всех её постов в индексе."""
+
+    def rebuild(self):
+        """Перестраивает индекс по всей таблице постов."""
+
+    def search(self, query, after=None, before=None, limit=None):
+        """Список пар (rank, post_id) строго после after (или перед
+        before) в порядке выдачи."""
+        raise NotImplementedError
+
+    def filter(self, queryset, query):
+        """Ограничивает queryset постами, подходящими под запрос."""
+        raise NotImplementedError
+
+
+class IContainsBackend(SearchBackend):
+    """Поиск через LIKE без индекса: для баз без FTS и для сравнения."""
+
+    def _matches(self, query):
+        return Post.objects.filter(Q(text__icontains=query)
+                                   | Q(group__title__icontains=query))
+
+    def search(self, query, after=None, before=None, limit=None):
+        ids = self._matches(query).order_by('id' if before is None
+                                            else '-id')
+        if after is not None:
+            ids = ids.filter(id__gt=after[1])
+        if before is not None:
+            ids = ids.filter(id__lt=before[1])
+        ids = ids.values_list('id', flat=True)[:limit]
+        rows = [(0.0, post_id) for post_id in ids]
+        return rows if before is None else rows[::-1]
+
+    def filter(self, queryset, query):
+        return queryset.filter(pk__in=self._matches(query).values('pk'))
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """Индекс в виртуальной таблице SQLite FTS5, ранжирование bm25."""
+
+    table = 'posts_post_fts'
+    # Совпадение в тексте поста весит больше, чем в названии группы.
+    rank = f'bm25({table}, 1.0, 0.5)'
+
+    @staticmethod
+    def match_expression(query):
+        """Безопасное выражение MATCH: каждое слово в кавычках."""
+        words = re.findall(r'\w+', query)
+        return ' '.join(f'"{word}"' for word in words) or None
+
+    def index(self, post):
+        group = post.group
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text, group_title, '
+                f'group_id) VALUES (%s, %s, %s, %s)',
+                [post.pk, post.text, group.title if group else '',
+                 post.group_id])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s',
+                           [post_id])
+
+    def update_group(self, group_id, title):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {self.table} SET group_title = %s, group_id = %s '
+                f'WHERE group_id = %s',
+                [title, group_id if title else None, group_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text, group_title, '
+                f'group_id) SELECT p.id, p.text, COALESCE(g.title, %s), '
+                f'p.group_id FROM posts_post p '
+                f'LEFT JOIN posts_group g ON g.id = p.group_id',
+                [''])
+
+    def search(self, query, after=None, before=None, limit=None):
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        sql = (f'SELECT {self.rank}, rowid FROM {self.table} '
+               f'WHERE {self.table} MATCH %s')
+        params = [expression]
+        cursor_values, sign, order = after, '>', 'ASC'
+        if before is not None:
+            cursor_values, sign, order = before, '<', 'DESC'
+        if cursor_values is not None:
+            sql += (f' AND ({self.rank} {sign} %s OR ({self.rank} = %s '
+                    f'AND rowid {sign} %s))')
+            params += [cursor_values[0], cursor_values[0], cursor_values[1]]
+        sql += f' ORDER BY {self.rank} {order}, rowid {order}'
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return rows if before is None else rows[::-1]
+
+    def filter(self, queryset, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            [expression]))
+
+
+backend = SimpleLazyObject(lambda: import_string(settings.SEARCH_BACKEND)())
+
+
+class SearchPaginator:
+    """Курсорная пагинация выдачи поиска, совместимая с CursorPage."""
+
+    ordering = SEARCH_ORDERING
+
+    def __init__(self, query, per_page):
+        self.query = query
+        self.per_page = int(per_page)
+
+    def _posts(self, rows):
+        posts = (Post.objects.select_related('author', 'group')
+                 .in_bulk([post_id for _, post_id in rows]))
+        result = []
+        for rank, post_id in rows:
+            if post_id in posts:
+                posts[post_id].search_rank = rank
+                result.append(posts[post_id])
+        return result
+
+    def page(self, after=None, before=None):
+        if before is not None:
+            rows = backend.search(self.query, before=before,
+                                  limit=self.per_page + 1)
+            if rows:
+                has_previous = len(rows) > self.per_page
+                return CursorPage(self._posts(rows[-self.per_page:]), self,
+                                  True, has_previous)
+            after = None
+        rows = backend.search(self.query, after=after,
+                              limit=self.per_page + 1)
+        return CursorPage(self._posts(rows[:self.per_page]), self,
+                          len(rows) > self.per_page, after is not None)
+
+    @staticmethod
+    def _decode(token):
+        data = decode_raw_cursor(token, 2) if token else None
+        try:
+            return [float(data[0]), int(data[1])] if data else None
+        except (TypeError, ValueError):
+            return None
+
+    def get_page(self, after_token=None, before_token=None):
+        before = self._decode(before_token)
+        after = None if before else self._decode(after_token)
+        return self.page(after=after, before=before)
@@ -0,0 +1,250 @@
+"""Синтетические данные для seed_dataset и bench_scaling.
+
+Распределения скошены как на живом сайте: число постов у автора и число
+подписчиков подчиняются закону Ципфа (пишущие больше всех и читаются
+больше всех), комментарии достаются в основном популярным постам. Текст
+берётся из заранее сгенерированного Faker набора фраз, строки
+вставляются пакетами с заранее известными id, поэтому данные можно
+досыпать к уже существующим.
+"""
+import datetime
+import itertools
+import math
+import os
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import activity, counters, timeline
+from .models import Comment, Follow, Group, Post, User
+from .search import backend as search_backend
+from .utils import explicit_dates
+
+BATCH_SIZE = 5000
+SENTENCES = 2000
+IMAGE_FILES = 20
+# Показатель закона Ципфа: чем больше, тем сильнее перекос.
+ZIPF_EXPONENT = 1.1
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    """Накопленные веса для random.choices: i-й элемент в (i+1)^s реже
+    первого."""
+    return list(itertools.accumulate(
+        1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def zipf_rank(rng, count, exponent=ZIPF_EXPONENT):
+    """Ранг от 0 до count-1 по закону Ципфа без списка весов: обратная
+    функция непрерывного распределения на [1, count+1)."""
+    u = rng.random()
+    if exponent == 1:
+        x = (count + 1) ** u
+    else:
+        power = 1 - exponent
+        x = (1 + u * ((count + 1) ** power - 1)) ** (1 / power)
+    return min(count - 1, int(x) - 1)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def _batches(count, size=BATCH_SIZE):
+    for offset in range(0, count, size):
+        yield offset, min(size, count - offset)
+
+
+class DatasetSeeder:
+    def __init__(self, seed=None, days=365, log=None):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        try:
+            from faker import Faker
+        except ImportError:
+            Faker = None
+        if Faker is not None:
+            fake = Faker('ru_RU')
+            fake.seed_instance(seed)
+            self.sentences = [fake.sentence(nb_words=12)
+                              for _ in range(SENTENCES)]
+            self.words = [fake.word() for _ in range(SENTENCES)]
+        else:
+            self.sentences = [f'Предложение номер {i}.'
+                              for i in range(SENTENCES)]
+            self.words = [f'слово{i}' for i in range(SENTENCES)]
+
+    def text(self, sentences=(1, 5)):
+        return ' '.join(self.rng.choices(self.sentences,
+                                         k=self.rng.randint(*sentences)))
+
+    def users(self, count, password=None):
+        start = _next_id(User)
+        password = make_password(password)
+        for offset, size in _batches(count):
+            User.objects.bulk_create(
+                User(id=start + offset + i,
+                     username=f'user{start + offset + i}',
+                     first_name=self.rng.choice(self.words).title(),
+                     last_name=self.rng.choice(self.words).title(),
+                     password=password)
+                for i in range(size))
+        self.log(f'Пользователей: +{count}')
+
+    def groups(self, count):
+        start = _next_id(Group)
+        Group.objects.bulk_create(
+            Group(id=start + i, slug=f'group-{start + i}',
+                  title=' '.join(self.rng.choices(self.words, k=2)).title(),
+                  description=self.text())
+            for i in range(count))
+        self.log(f'Групп: +{count}')
+
+    def images(self):
+        """Набор маленьких картинок разного цвета в MEDIA_ROOT."""
+        from PIL import Image
+
+        names = []
+        for i in range(IMAGE_FILES):
+            name = f'posts/seed-{i}.png'
+            if not default_storage.exists(name):
+                color = tuple(self.rng.randrange(256) for _ in range(3))
+                image = Image.new('RGB', (960, 540), color)
+                path = default_storage.path(name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with default_storage.open(name, 'wb') as f:
+                    image.save(f, 'PNG')
+            names.append(name)
+        return names
+
+    def _ranked(self, model):
+        """id в случайном порядке и веса Ципфа для выбора среди них."""
+        ids = list(model.objects.values_list('id', flat=True))
+        self.rng.shuffle(ids)
+        return ids, zipf_weights(len(ids))
+
+    def posts(self, count, image_ratio=0.0, no_group_ratio=0.3):
+        authors, author_weights = self._ranked(User)
+        groups, group_weights = self._ranked(Group)
+        images = self.images() if image_ratio else []
+        start = _next_id(Post)
+        span = self.days * 86400
+        fields = (Post._meta.get_field('pub_date'),
+                  Post._meta.get_field('modified'))
+        with explicit_dates(*fields):
+            for offset, size in _batches(count):
+                chosen = self.rng.choices(authors, cum_weights=author_weights,
+                                          k=size)
+                rows = []
+                for i, author_id in enumerate(chosen):
+                    pub_date = self.now - datetime.timedelta(
+                        seconds=self.rng.random() * span)
+                    group_id = None
+                    if groups and self.rng.random() >= no_group_ratio:
+                        group_id = self.rng.choices(
+                            groups, cum_weights=group_weights)[0]
+                    image = ''
+                    if images and self.rng.random() < image_ratio:
+                        image = self.rng.choice(images)
+                    rows.append(Post(
+                        id=start + offset + i, text=self.text(),
+                        author_id=author_id, group_id=group_id,
+                        pub_date=pub_date, modified=pub_date,
+                        last_activity=pub_date, image=image))
+                with transaction.atomic():
+                    Post.objects.bulk_create(rows)
+                self.log(f'Постов: {offset + size}/{count}')
+
+    def comments(self, count):
+        """count комментариев; посты выбираются по Ципфу пакетами.
+
+        Список всех постов в память не загружается: ранг Ципфа
+        переводится в id случайной перестановкой rank -> (a*rank+b) mod span
+        по диапазону id, а даты публикации читаются только для выбранных
+        id пакета. Ранги, попавшие в дыры диапазона, разыгрываются заново.
+        """
+        bounds = Post.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            return
+        first, span = bounds['first'], bounds['last'] - bounds['first'] + 1
+        step = self.rng.randrange(1, span + 1)
+        while math.gcd(step, span) != 1:
+            step = self.rng.randrange(1, span + 1)
+        shift = self.rng.randrange(span)
+        users = list(User.objects.values_list('id', flat=True))
+        start = _next_id(Comment)
+        with explicit_dates(Comment._meta.get_field('created')):
+            for offset, size in _batches(count):
+                chosen = []
+                while len(chosen) < size:
+                    ids = [first + (step * zipf_rank(self.rng, span) + shift)
+                           % span for _ in range(size - len(chosen))]
+                    dates = {}
+                    unique = list(set(ids))
+                    # Не больше лимита параметров запроса SQLite (999).
+                    for chunk in range(0, len(unique), 500):
+                        dates.update(Post.objects.filter(
+                            id__in=unique[chunk:chunk + 500])
+                            .values_list('id', 'pub_date'))
+                    chosen.extend((post_id, dates[post_id])
+                                  for post_id in ids if post_id in dates)
+                rows = []
+                for i, (post_id, pub_date) in enumerate(chosen):
+                    # Обсуждение затухает: большинство комментариев — в
+                    # первые часы после публикации.
+                    created = min(self.now, pub_date + datetime.timedelta(
+                        minutes=self.rng.expovariate(1 / 180)))
+                    rows.append(Comment(
+                        id=start + offset + i, post_id=post_id,
+                        author_id=self.rng.choice(users),
+                        text=self.text((1, 2)), created=created))
+                with transaction.atomic():
+                    Comment.objects.bulk_create(rows)
+                self.log(f'Комментариев: {offset + size}/{count}')
+
+    def follows(self, count):
+        """count подписок: подписчики равномерно, авторы — по Ципфу."""
+        authors, weights = self._ranked(User)
+        users = list(User.objects.values_list('id', flat=True))
+        created = 0
+        for offset, size in _batches(count):
+            pairs = {(user_id, author_id) for user_id, author_id in zip(
+                self.rng.choices(users, k=size),
+                self.rng.choices(authors, cum_weights=weights, k=size))
+                if user_id != author_id}
+            with transaction.atomic():
+                Follow.objects.bulk_create(
+                    (Follow(user_id=user_id, author_id=author_id)
+                     for user_id, author_id in pairs),
+                    ignore_conflicts=True)
+            created += len(pairs)
+        self.log(f'Подписок: до {created}')
+
+    def finish(self):
+        """Счётчики, активность, поиск и ленты: bulk_create не отправляет
+        сигналы."""
+        self.log('Пересчёт счётчиков и активности постов...')
+        counters.recount()
+        activity.refresh()
+        self.log('Перестройка поискового индекса...')
+        search_backend.rebuild()
+        self.log('Перестройка лент подписок...')
+        entries = timeline.rebuild()
+        self.log(f'Записей в лентах: {entries}')
+
+
+def seed_dataset(users, groups, posts, comments, follows, image_ratio=0.0,
+                 seed=None, password=None, log=None):
+    seeder = DatasetSeeder(seed=seed, log=log)
+    seeder.users(users, password)
+    seeder.groups(groups)
+    seeder.posts(posts, image_ratio)
+    seeder.comments(comments)
+    seeder.follows(follows)
+    seeder.finish()
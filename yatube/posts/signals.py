@@ -0,0 +1,163 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import activity, counters, feed_cache, images, timeline
+from .search import backend as search_backend
+from .models import Comment, Follow, Group, Post, User
+
+# id постов, которые сейчас удаляются: их комментарии удаляются каскадом,
+# и обновлять для каждого счётчик, активность и версии лент незачем.
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(post_init, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    # Нужны прежние группа и картинка, чтобы после сохранения понять,
+    # что именно изменилось; Post.save обновляет их после всех
+    # обработчиков post_save.
+    instance._saved_group_id = instance.group_id
+    instance._saved_image = instance.image.name
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    old_group_id = instance._saved_group_id
+    if created:
+        counters.incr(counters.ALL_POSTS)
+        counters.incr(counters.author_posts(instance.author_id))
+    elif old_group_id != instance.group_id and old_group_id is not None:
+        counters.incr(counters.group_posts(old_group_id), -1)
+    if instance.group_id is not None and (
+            created or old_group_id != instance.group_id):
+        counters.incr(counters.group_posts(instance.group_id))
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.push(instance)
+
+
+@receiver(post_save, sender=Post)
+def ingest_image(sender, instance, created, **kwargs):
+    name = instance.image.name
+    if name and (created or name != instance._saved_image):
+        transaction.on_commit(lambda: images.schedule_ingest(name))
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    search_backend.index(instance)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, **kwargs):
+    feed_cache.bump_on_commit(*feed_cache.post_scopes(
+        instance.author_id, instance.group_id, instance._saved_group_id))
+
+
+@receiver(pre_delete, sender=Post)
+def mark_deleting_post(sender, instance, **kwargs):
+    # Collector шлёт pre_delete всем объектам до удаления, а post_delete
+    # поста — после post_delete его комментариев.
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+    counters.incr(counters.ALL_POSTS, -1)
+    counters.incr(counters.author_posts(instance.author_id), -1)
+    if instance.group_id is not None:
+        counters.incr(counters.group_posts(instance.group_id), -1)
+    counters.reset(counters.post_comments(instance.pk))
+    search_backend.remove(instance.pk)
+    feed_cache.bump_on_commit(feed_cache.post_scope(instance.pk),
+                              *feed_cache.post_scopes(instance.author_id,
+                                                      instance.group_id))
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(counters.post_comments(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        # Счётчик комментариев сбрасывает count_deleted_post.
+        return
+    counters.incr(counters.post_comments(instance.post_id), -1)
+
+
+@receiver(post_save, sender=Comment)
+def touch_commented_post(sender, instance, created, **kwargs):
+    if created:
+        activity.touch(instance.post_id, instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def refresh_commented_post(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        return
+    activity.refresh([instance.post_id])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        # Ленты удаляемого поста сбрасывает count_deleted_post.
+        return
+    post = (Post.objects.filter(pk=instance.post_id)
+            .values('author_id', 'group_id').first())
+    if post is not None:
+        feed_cache.bump_on_commit(
+            feed_cache.post_scope(instance.post_id),
+            *feed_cache.post_scopes(post['author_id'], post['group_id']))
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(counters.followers(instance.author_id))
+        counters.incr(counters.following(instance.user_id))
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.incr(counters.followers(instance.author_id), -1)
+    counters.incr(counters.following(instance.user_id), -1)
+    timeline.remove(instance.user_id, instance.author_id)
+    timeline.demote(instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+def index_saved_group(sender, instance, created, **kwargs):
+    if not created:
+        search_backend.update_group(instance.pk, instance.title)
+
+
+@receiver(post_delete, sender=Group)
+def drop_group_counter(sender, instance, **kwargs):
+    counters.reset(counters.group_posts(instance.pk))
+    search_backend.update_group(instance.pk, '')
+
+
+@receiver(post_delete, sender=User)
+def drop_user_counters(sender, instance, **kwargs):
+    counters.reset(counters.author_posts(instance.pk),
+                   counters.followers(instance.pk),
+                   counters.following(instance.pk))
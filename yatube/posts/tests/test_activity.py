@@ -0,0 +1,80 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Group, Post, User
+from posts.utils import explicit_dates
+
+
+class ActivityTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        now = timezone.now()
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            cls.old = Post.objects.create(
+                text='Старый пост', author=cls.author, group=cls.group,
+                pub_date=now - datetime.timedelta(days=2),
+                last_activity=now - datetime.timedelta(days=2))
+            cls.new = Post.objects.create(
+                text='Новый пост', author=cls.author, group=cls.group,
+                pub_date=now - datetime.timedelta(days=1),
+                last_activity=now - datetime.timedelta(days=1))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def comment(self, post):
+        return Comment.objects.create(post=post, author=self.author,
+                                      text='Комментарий')
+
+    def group_page(self, **params):
+        return self.client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            params).context['page_obj']
+
+    def test_listings_carry_comment_count_and_time(self):
+        """Ленты получают число комментариев и время последнего вместе
+        с постами"""
+        self.comment(self.old)
+        last = self.comment(self.old)
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', kwargs={'slug': 'group'}),
+                    reverse('posts:profile', kwargs={'username': 'author'})):
+            with self.subTest(url=url):
+                page = self.client.get(url).context['page_obj']
+                post = next(post for post in page if post == self.old)
+                self.assertEqual(post.comment_count, 2)
+                self.assertEqual(post.last_comment, last.created)
+                fresh = next(post for post in page if post == self.new)
+                self.assertEqual(fresh.comment_count, 0)
+                self.assertIsNone(fresh.last_comment)
+
+    def test_group_sorted_by_activity(self):
+        """Обсуждаемый старый пост поднимается в ленте группы по
+        активности, а обычная лента не меняется"""
+        self.comment(self.old)
+        self.assertEqual(list(self.group_page()), [self.new, self.old])
+        self.assertEqual(list(self.group_page(sort='activity')),
+                         [self.old, self.new])
+
+    def test_edit_keeps_activity_and_delete_restores_it(self):
+        """Правка поста не затирает активность, а удаление комментария
+        возвращает прежнюю"""
+        stale = Post.objects.get(pk=self.old.pk)
+        comment = self.comment(self.old)
+        stale.text = 'Исправленный пост'
+        stale.save()
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.last_activity, comment.created)
+        comment.delete()
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.last_activity, self.old.pub_date)
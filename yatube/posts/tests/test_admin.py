@@ -0,0 +1,95 @@
+from itertools import count
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import QueryBudgetTestMixin
+from posts.models import Comment, Group, Post, User
+
+
+class LargeTableAdminTest(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        cls.names = count()
+        cls.post = cls.grow()
+
+    @classmethod
+    def grow(cls, size=5):
+        """Посты и комментарии разных авторов в разных группах."""
+        for _ in range(size):
+            number = next(cls.names)
+            author = User.objects.create_user(username=f'author{number}')
+            group = Group.objects.create(title=f'Группа {number}',
+                                         slug=f'group-{number}',
+                                         description='Описание')
+            post = Post.objects.create(text=f'Пост {number}',
+                                       author=author, group=group)
+            Comment.objects.create(post=post, author=author,
+                                   text='Комментарий')
+        return post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_changelist_query_count_is_stable(self):
+        """Число запросов списка не растёт вместе с числом строк"""
+        date = self.post.pub_date
+        for name, params in (
+                ('posts_post_changelist', {}),
+                ('posts_comment_changelist', {}),
+                ('posts_post_changelist', {'pub_date__year': date.year}),
+                ('posts_post_changelist', {'pub_date__year': date.year,
+                                           'pub_date__month': date.month})):
+            with self.subTest(name=name, params=params):
+                self.assertQueryCountStable(
+                    lambda: self.client.get(reverse(f'admin:{name}'),
+                                            params),
+                    self.grow, msg=name)
+
+    def test_date_hierarchy_uses_index(self):
+        """Навигация по датам не усекает дату каждой строки"""
+        url = reverse('admin:posts_post_changelist')
+        date = self.post.pub_date
+        for params in ({}, {'pub_date__year': date.year},
+                       {'pub_date__year': date.year,
+                        'pub_date__month': date.month},
+                       {'pub_date__year': date.year,
+                        'pub_date__month': date.month,
+                        'pub_date__day': date.day}):
+            with self.subTest(params=params), \
+                    CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+                self.assertEqual(response.context['cl'].result_count,
+                                 Post.objects.count())
+                self.assertContains(response, 'class="toplinks"')
+                self.assertFalse([query['sql'] for query in queries
+                                  if 'django_date' in query['sql']
+                                  or 'DISTINCT' in query['sql']])
+
+    def test_changelist_does_not_count_table(self):
+        """Без фильтров строки не считаются, с фильтром — с пределом"""
+        url = reverse('admin:posts_post_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count,
+                         Post.objects.count())
+        self.assertFalse([query['sql'] for query in queries
+                          if 'COUNT(' in query['sql']])
+        response = self.client.get(url, {'pub_date__year':
+                                         self.post.pub_date.year})
+        self.assertEqual(response.context['cl'].result_count,
+                         Post.objects.count())
+
+    def test_editable_group_uses_autocomplete(self):
+        """В list_editable вместо списка всех групп — автодополнение"""
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, f'>{self.post.group}</option>')
+        self.assertNotContains(response, '>Группа 0</option>\n<option')
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [Post.objects.create(text=f'Пост {number}',
+                                         author=cls.author, group=cls.group)
+                     for number in range(5)]
+        Comment.objects.create(post=cls.posts[-1], author=cls.author,
+                               text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_serialize_posts(self):
+        """Ленты отдают посты с автором, группой и активностью"""
+        for url in (reverse('posts:api_feed'),
+                    reverse('posts:api_group_feed',
+                            kwargs={'slug': 'group'}),
+                    reverse('posts:api_author_feed',
+                            kwargs={'username': 'author'})):
+            with self.subTest(url=url):
+                first = self.client.get(url).json()['results'][0]
+                self.assertEqual(first['id'], self.posts[-1].pk)
+                self.assertEqual(first['author'], 'author')
+                self.assertEqual(first['group'], 'group')
+                self.assertEqual(first['comment_count'], 1)
+                self.assertIsNone(first['image'])
+
+    def test_sparse_fields(self):
+        """?fields= оставляет в ответе только запрошенные поля"""
+        url = reverse('posts:api_feed')
+        with self.assertNumQueries(3):
+            data = self.client.get(url, {'fields': 'id,text'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        response = self.client.get(url, {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(API_PAGE_SIZE=2)
+    def test_cursor_pages(self):
+        """Ссылки next и previous листают ленту без пропусков и повторов"""
+        url = reverse('posts:api_feed') + '?fields=id'
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            seen += [item['id'] for item in data['results']]
+            previous, url = data['previous'], data['next']
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+        self.assertIn('fields=id', previous)
+        back = self.client.get(previous).json()['results']
+        self.assertEqual([item['id'] for item in back], seen[2:4])
+
+    def test_post_with_comments(self):
+        """Пост отдаётся вместе с комментариями, 304 по ETag"""
+        url = reverse('posts:api_post', kwargs={'post_id': self.posts[-1].pk})
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['post']['text'], 'Пост 4')
+        self.assertEqual(data['comments']['results'][0]['text'],
+                         'Комментарий')
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        missing = self.client.get(
+            reverse('posts:api_post', kwargs={'post_id': 0}))
+        self.assertEqual(missing.status_code, 404)
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.auth import user_key
+from posts.models import Post, User
+
+PASSWORD = 'Zx9-secret-pass'
+
+
+class CachedAuthTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author',
+                                              password=PASSWORD)
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.client.get(reverse('about:author'))
+
+    def is_logged_in(self, client):
+        response = client.get(reverse('posts:post_create'))
+        return response.status_code == 200
+
+    def test_user_and_session_come_from_cache(self):
+        """Повторный запрос не читает ни сессию, ни пользователя из базы"""
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('about:author'))
+        self.assertEqual(response.context['user'], self.author)
+
+    def test_password_hash_is_not_cached(self):
+        """В кэше нет хэша пароля, только хэш для проверки сессии"""
+        record = cache.get(user_key(self.author.pk))
+        self.assertNotIn('password', record['fields'])
+        self.assertNotIn(self.author.password, str(record))
+        self.assertEqual(record['session_hash'],
+                         self.author.get_session_auth_hash())
+
+    def test_saved_user_is_reloaded(self):
+        """Сохранение пользователя сбрасывает его запись в кэше"""
+        self.author.is_active = False
+        self.author.save()
+        self.assertFalse(self.is_logged_in(self.client))
+
+    def test_password_change_ends_other_sessions(self):
+        """Смена пароля разлогинивает остальные сессии, но не текущую"""
+        other = Client()
+        other.force_login(self.author)
+        self.assertTrue(self.is_logged_in(other))
+        self.client.post(reverse('password_change'), {
+            'old_password': PASSWORD,
+            'new_password1': 'Qw8-another-pass',
+            'new_password2': 'Qw8-another-pass',
+        })
+        self.assertTrue(self.is_logged_in(self.client))
+        self.assertFalse(self.is_logged_in(other))
+
+    def test_logout_and_ownership(self):
+        """После выхода сессия не действует; чужой пост не редактируется"""
+        edit_url = reverse('posts:post_edit',
+                           kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.client.get(edit_url).status_code, 200)
+        stranger = Client()
+        stranger.force_login(User.objects.create_user(username='stranger'))
+        self.assertEqual(stranger.get(edit_url).status_code, 302)
+        cookie = self.client.cookies['sessionid'].value
+        self.client.get(reverse('users:logout'))
+        stale = Client()
+        stale.cookies['sessionid'] = cookie
+        self.assertFalse(self.is_logged_in(stale))
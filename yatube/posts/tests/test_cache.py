@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from core.cache import LocalStore, TieredCache
+
+TEMP_CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class TieredCacheTest(SimpleTestCase):
+    """Два экземпляра со своими L1 над одним файлом L2 — как два процесса."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        location = os.path.join(TEMP_CACHE_DIR, f'{self.id()}.sqlite3')
+        params = {'OPTIONS': {'SYNC_INTERVAL': 0, 'L1_MAX_ENTRIES': 3}}
+        self.worker = TieredCache(location, params)
+        self.other = TieredCache(location, params)
+        self.other._l1 = LocalStore(3)
+
+    def test_shared_l2(self):
+        """Запись одного процесса видна другому"""
+        self.worker.set('key', {'value': 1})
+        self.assertEqual(self.other.get('key'), {'value': 1})
+        self.assertEqual(self.other.get_many(['key', 'missing']),
+                         {'key': {'value': 1}})
+
+    def test_invalidation_reaches_other_l1(self):
+        """Запись и удаление вытесняют ключ из L1 другого процесса"""
+        self.worker.set('key', 'old')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.worker.set('key', 'new')
+        self.assertEqual(self.other.get('key'), 'new')
+        self.worker.add('counter', 1)
+        self.assertEqual(self.other.get('counter'), 1)
+        self.worker.incr('counter', 5)
+        self.assertEqual(self.other.get('counter'), 6)
+        self.worker.delete('key')
+        self.assertIsNone(self.other.get('key'))
+        self.other.set('key', 'again')
+        self.worker.clear()
+        self.assertIsNone(self.other.get('key'))
+
+    def test_stale_l1_within_sync_interval(self):
+        """Без синхронизации L1 отдаёт своё значение, не обращаясь к L2"""
+        self.other.sync_interval = 3600
+        self.worker.set('key', 'old')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.worker.set('key', 'new')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.other._sync(force=True)
+        self.assertEqual(self.other.get('key'), 'new')
+
+    def test_l1_is_bounded_lru(self):
+        """L1 хранит не больше L1_MAX_ENTRIES последних ключей"""
+        for key in 'abcd':
+            self.worker.set(key, key)
+        self.assertEqual(len(self.worker._store.entries), 3)
+        self.assertEqual(self.worker.get('a'), 'a')
+
+    def test_add_incr_and_expiry(self):
+        """add не перезаписывает, incr требует ключ, истёкшие не видны"""
+        self.assertTrue(self.worker.add('key', 1))
+        self.assertFalse(self.other.add('key', 2))
+        self.assertEqual(self.other.incr('key'), 2)
+        self.assertEqual(self.worker.get('key'), 2)
+        with self.assertRaises(ValueError):
+            self.worker.incr('missing')
+        self.worker.set('gone', 1, timeout=0)
+        self.assertIsNone(self.other.get('gone'))
+        self.assertTrue(self.worker.add('gone', 2))
+
+    def test_update_reads_l2(self):
+        """update видит запись другого процесса даже при устаревшем L1"""
+        self.worker.sync_interval = 3600
+        self.worker.set('key', 1)
+        self.other.set('key', 10)
+
+        def double(value):
+            return value * 2, value
+
+        self.assertEqual(self.worker.update('key', double), 10)
+        self.assertEqual(self.other.get('key'), 20)
+        self.assertEqual(self.worker.update('missing', lambda value: (
+            1, value)), None)
+
+    def test_stats(self):
+        """Статистика попаданий собирается со всех процессов"""
+        self.worker.set('key', 1)
+        self.worker.get('key')
+        self.other.get('key')
+        self.other.get('missing')
+        # Счётчики процесса попадают в общую таблицу при синхронизации.
+        self.other._sync(force=True)
+        stats = self.worker.stats()
+        self.assertEqual((stats['l1_hits'], stats['l2_hits'],
+                          stats['misses']), (1, 1, 1))
+        self.assertEqual(stats['l2_entries'], 1)
@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import OnCommitTestMixin
+from posts import cards, feed_cache
+from posts.models import Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostCardsTest(OnCommitTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Первая версия',
+                                       author=cls.author, group=cls.group)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_listing_reuses_cached_cards(self):
+        """После сброса фрагмента ленты карточки берутся из кэша"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        feed_cache.bump(feed_cache.INDEX)
+        with mock.patch('posts.cards.render_card',
+                        wraps=cards.render_card) as render:
+            response = self.client.get(url)
+        self.assertContains(response, 'Первая версия')
+        render.assert_not_called()
+
+    def test_edit_replaces_card(self):
+        """Правка через post_edit показывает новую карточку во всех лентах"""
+        self.client.get(reverse('posts:index'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+                {'text': 'Вторая версия', 'group': self.group.pk})
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', kwargs={'slug': 'group'}),
+                    reverse('posts:profile', kwargs={'username': 'author'})):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Вторая версия')
+                self.assertNotContains(response, 'Первая версия')
+
+    def test_card_without_thumbnail_is_not_cached(self):
+        """Карточка со ссылкой на исходник вместо миниатюры не кэшируется"""
+        post = Post.objects.create(
+            text='С картинкой', author=self.author,
+            image=SimpleUploadedFile('small.gif', b'GIF89a',
+                                     content_type='image/gif'))
+        with mock.patch('posts.thumbnails.schedule'):
+            cards.render_cards([post], 'index')
+        self.assertIsNone(cache.get(cards.card_key(post, 'index')))
@@ -0,0 +1,127 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import OnCommitTestMixin
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTest(OnCommitTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list',
+                                  kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': self.author.username}),
+            'post_detail': reverse('posts:post_detail',
+                                   kwargs={'post_id': self.post.id}),
+        }
+
+    def etags(self, client=None):
+        client = client or self.guest_client
+        return {name: client.get(url)['ETag']
+                for name, url in self.urls.items()}
+
+    def test_not_modified(self):
+        """Совпавшие ETag и Last-Modified дают 304"""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                for header, value in (
+                        ('HTTP_IF_NONE_MATCH', response['ETag']),
+                        ('HTTP_IF_MODIFIED_SINCE',
+                         response['Last-Modified'])):
+                    cached = self.guest_client.get(url, **{header: value})
+                    self.assertEqual(cached.status_code, 304)
+                    self.assertEqual(cached.content, b'')
+
+    def test_validators_depend_on_user_and_page(self):
+        """ETag у разных пользователей и страниц разный"""
+        guest = self.etags()
+        reader = self.etags(self.reader_client)
+        for name in self.urls:
+            with self.subTest(name=name):
+                self.assertNotEqual(guest[name], reader[name])
+        page = self.guest_client.get(self.urls['index'], {'page': 2})
+        self.assertNotEqual(page['ETag'], guest['index'])
+        self.assertNotIn('Last-Modified',
+                         self.reader_client.get(self.urls['index']))
+
+    def assertWriteChanges(self, write, names):
+        before = self.etags()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        after = self.etags()
+        for name in self.urls:
+            with self.subTest(write=write.__name__, name=name):
+                if name in names:
+                    self.assertNotEqual(before[name], after[name])
+                    response = self.guest_client.get(
+                        self.urls[name], HTTP_IF_NONE_MATCH=before[name])
+                    self.assertEqual(response.status_code, 200)
+                else:
+                    self.assertEqual(before[name], after[name])
+
+    def test_writes_change_validators(self):
+        """Создание, правка и удаление постов и комментариев меняют ETag"""
+        feeds = ('index', 'group_list', 'profile')
+
+        def create_post():
+            Post.objects.create(text='Новый пост', author=self.author,
+                                group=self.group)
+
+        def edit_post():
+            self.post.text = 'Исправленный текст'
+            self.post.save()
+
+        def add_comment():
+            self.comment = Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий')
+
+        def delete_comment():
+            self.comment.delete()
+
+        def delete_other_post():
+            Post.objects.exclude(pk=self.post.pk).delete()
+
+        self.assertWriteChanges(create_post, (*feeds, 'post_detail'))
+        self.assertWriteChanges(edit_post, (*feeds, 'post_detail'))
+        self.assertWriteChanges(add_comment, (*feeds, 'post_detail'))
+        self.assertWriteChanges(delete_comment, (*feeds, 'post_detail'))
+        self.assertWriteChanges(delete_other_post,
+                                (*feeds, 'post_detail'))
+
+    def test_follow_changes_profile(self):
+        """Подписка меняет ETag профиля у подписчика"""
+        url = self.urls['profile']
+        before = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertNotEqual(self.reader_client.get(url)['ETag'], before)
+
+    def test_missing_objects_still_404(self):
+        """Для несуществующих объектов условный GET не мешает 404"""
+        for url in (reverse('posts:group_list', kwargs={'slug': 'nope'}),
+                    reverse('posts:profile', kwargs={'username': 'nope'}),
+                    reverse('posts:post_detail', kwargs={'post_id': 999})):
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
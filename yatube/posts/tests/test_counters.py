@@ -0,0 +1,158 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import counters
+from posts.models import Comment, Counter, Follow, Group, Post, User
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.group_another = Group.objects.create(
+            title='Другая группа',
+            slug='test-slug-2',
+            description='Ещё одно тестовое описание'
+        )
+
+    def test_post_counters_follow_create_edit_delete(self):
+        """Счётчики постов меняются при создании, смене группы и удалении"""
+        post = Post.objects.create(text='Тестовый текст', author=self.author,
+                                   group=self.group)
+        self.assertEqual(counters.get_many(
+            counters.ALL_POSTS,
+            counters.author_posts(self.author.pk),
+            counters.group_posts(self.group.pk),
+        ), {
+            counters.ALL_POSTS: 1,
+            counters.author_posts(self.author.pk): 1,
+            counters.group_posts(self.group.pk): 1,
+        })
+        post.group = self.group_another
+        post.save()
+        self.assertEqual(counters.get(counters.group_posts(self.group.pk)), 0)
+        self.assertEqual(
+            counters.get(counters.group_posts(self.group_another.pk)), 1)
+        post.delete()
+        self.assertEqual(counters.get(counters.ALL_POSTS), 0)
+        self.assertEqual(
+            counters.get(counters.group_posts(self.group_another.pk)), 0)
+
+    def test_late_receiver_sees_previous_group(self):
+        """Последний обработчик post_save видит прежнюю группу поста"""
+        post = Post.objects.create(text='Тестовый текст', author=self.author,
+                                   group=self.group)
+        seen = []
+
+        def receiver(sender, instance, **kwargs):
+            seen.append(instance._saved_group_id)
+
+        post_save.connect(receiver, sender=Post)
+        self.addCleanup(post_save.disconnect, receiver, sender=Post)
+        post.group = self.group_another
+        post.save()
+        post.save()
+        self.assertEqual(seen, [self.group.pk, self.group_another.pk])
+        self.assertEqual(
+            counters.get(counters.group_posts(self.group_another.pk)), 1)
+
+    def test_comment_and_follow_counters(self):
+        """Счётчики комментариев и подписок"""
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(counters.get(counters.post_comments(post.pk)), 1)
+        self.assertEqual(counters.get(counters.followers(self.author.pk)), 1)
+        self.assertEqual(counters.get(counters.following(self.reader.pk)), 1)
+        comment.delete()
+        Follow.objects.all().delete()
+        self.assertEqual(counters.get(counters.post_comments(post.pk)), 0)
+        self.assertEqual(counters.get(counters.followers(self.author.pk)), 0)
+
+    def test_post_delete_skips_comment_receivers(self):
+        """Удаление поста не обновляет счётчики и ленты по каждому
+        комментарию: число запросов не зависит от числа комментариев"""
+        queries = []
+        for count in (1, 5):
+            post = Post.objects.create(text='Тестовый текст',
+                                       author=self.author, group=self.group)
+            for _ in range(count):
+                Comment.objects.create(post=post, author=self.reader,
+                                       text='Комментарий')
+            with CaptureQueriesContext(connection) as captured:
+                post.delete()
+            queries.append(len(captured))
+            self.assertEqual(counters.get(counters.post_comments(post.pk)), 0)
+        self.assertEqual(queries[0], queries[1])
+        Post.objects.create(text='Тестовый текст', author=self.author)
+        comment = Comment.objects.create(
+            post=Post.objects.get(), author=self.reader, text='Комментарий')
+        comment.delete()
+        self.assertEqual(
+            counters.get(counters.post_comments(comment.post_id)), 0)
+
+    def test_recount_repairs_counters(self):
+        """Команда recount восстанавливает испорченные счётчики"""
+        Post.objects.bulk_create(
+            Post(text='Тестовый текст', author=self.author, group=self.group)
+            for _ in range(3)
+        )
+        Counter.objects.update(value=100)
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(counters.get(counters.ALL_POSTS), 3)
+        self.assertEqual(counters.get(counters.group_posts(self.group.pk)), 3)
+
+    def test_recount_runs_in_database(self):
+        """recount считает в базе: число запросов не зависит от данных,
+        а счётчики удалённых групп пропадают"""
+        Post.objects.bulk_create(
+            Post(text='Тестовый текст', author=self.author, group=self.group)
+            for _ in range(3)
+        )
+        Counter.objects.create(key=counters.group_posts(10 ** 6), value=5)
+        with CaptureQueriesContext(connection) as small:
+            counters.recount()
+        Post.objects.bulk_create(
+            Post(text='Тестовый текст', author=self.reader,
+                 group=self.group_another)
+            for _ in range(3)
+        )
+        with CaptureQueriesContext(connection) as large:
+            counters.recount()
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(counters.get(counters.group_posts(10 ** 6)), 0)
+        self.assertEqual(counters.get_many(
+            counters.author_posts(self.reader.pk),
+            counters.group_posts(self.group_another.pk),
+        ), {
+            counters.author_posts(self.reader.pk): 3,
+            counters.group_posts(self.group_another.pk): 3,
+        })
+
+    def test_feed_paginator_does_not_count(self):
+        """Лента берёт число постов из счётчика, а не из COUNT(*)"""
+        Post.objects.create(text='Тестовый текст', author=self.author)
+        client = Client()
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list',
+                            kwargs={'slug': self.group.slug})):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse([query for query in queries.captured_queries
+                                  if 'COUNT(' in query['sql']])
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -13,7 +14,7 @@ from posts.models import Comment, Group, Post, User
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -68,6 +69,8 @@ class PostCreateFormTests(TestCase):
             follow=True
         )
         new_post = Post.objects.latest('id')
+        # Загрузки называются по хэшу содержимого (core.storage).
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertRedirects(response, reverse('posts:profile',
                              kwargs={'username': PostCreateFormTests.user}))
         self.assertEqual(Post.objects.count(), posts_count + 1)
@@ -75,7 +78,7 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(new_post.group.id, form_data['group'])
         self.assertTrue(
             Post.objects.filter(
-                image='posts/small.gif',
+                image=f'posts/{digest[:2]}/{digest}.gif',
                 text=form_data['text'],
                 group=form_data['group']
             ).exists()
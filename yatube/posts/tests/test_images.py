@@ -0,0 +1,95 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.images import ORIENTATION, ingest, normalize
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_jpeg(size, orientation=1):
+    image = Image.new('RGB', size, (200, 30, 30))
+    # Верхний левый угол отличается, чтобы проверить поворот.
+    image.paste((30, 30, 200), (0, 0, size[0] // 4, size[1] // 4))
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=100)
+class ImageIngestTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def store(self, content):
+        return default_storage.save('posts/photo.jpg', ContentFile(content))
+
+    def test_large_image_is_rotated_and_downscaled(self):
+        """Фоновая обработка поворачивает картинку по EXIF и вписывает
+        её в IMAGE_MAX_SIDE"""
+        # Ориентация 6: снимок нужно повернуть на 90° по часовой стрелке.
+        content = make_jpeg((400, 200), orientation=6)
+        name = self.store(content)
+        normalized = normalize(name)
+        self.assertNotEqual(normalized, name)
+        # Исходник мог быть отдан как immutable: его байты не меняются.
+        with default_storage.open(name) as f:
+            self.assertEqual(f.read(), content)
+        with default_storage.open(normalized) as f, Image.open(f) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertEqual(image.getexif().get(ORIENTATION, 1), 1)
+            # Синий угол после поворота оказался справа сверху.
+            red, green, blue = image.getpixel((45, 5))
+            self.assertGreater(blue, red)
+
+    def test_small_upright_image_is_kept(self):
+        """Картинку, которую не нужно поворачивать и уменьшать, не трогают"""
+        content = make_jpeg((80, 60))
+        name = self.store(content)
+        self.assertIsNone(normalize(name))
+        with default_storage.open(name) as f:
+            self.assertEqual(f.read(), content)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_ingest_switches_posts_to_normalized_image(self):
+        """После обработки пост ссылается на новый файл, а исходник
+        остаётся прежним"""
+        name = self.store(make_jpeg((400, 200)))
+        post = Post.objects.create(
+            text='Текст', image=name,
+            author=User.objects.create_user(username='author'))
+        ingest(name)
+        normalized = Post.objects.get(pk=post.pk)
+        self.assertNotEqual(normalized.image.name, name)
+        # Новый modified — новый ключ кэша карточки поста.
+        self.assertGreater(normalized.modified, post.modified)
+        self.assertTrue(default_storage.exists(normalized.image.name))
+        self.assertTrue(default_storage.exists(name))
+        # Обработанную картинку повторная обработка не трогает.
+        ingest(normalized.image.name)
+        self.assertEqual(Post.objects.get(pk=post.pk).image,
+                         normalized.image)
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_decompression_bomb_is_rejected(self):
+        """Форма отклоняет картинку больше IMAGE_MAX_PIXELS по заголовку"""
+        form = PostForm(
+            data={'text': 'Текст'},
+            files={'image': SimpleUploadedFile(
+                'big.jpg', make_jpeg((50, 50)), content_type='image/jpeg')})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
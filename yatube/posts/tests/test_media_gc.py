@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+
+from posts.media_gc import MediaCollector
+from posts.models import Post, User
+from posts.thumbnails import schedule_post_image, source_image
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class MediaCollectorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root,
+                                  THUMBNAIL_WORKERS=0)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.kept = self.create_post('kept.gif')
+        post = self.create_post('replaced.gif')
+        self.orphan = post.image.name
+        self.orphan_thumbnails = self.thumbnails(self.orphan)
+        post.image = self.upload('new.gif')
+        post.save()
+
+    def create_post(self, name):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.author,
+            image=self.upload(name))
+        schedule_post_image(post.image.name)
+        return post
+
+    def upload(self, name):
+        """Картинка с разным содержимым для каждого имени: одинаковые
+        загрузки хранятся одним файлом."""
+        return SimpleUploadedFile(name, SMALL_GIF + name.encode(),
+                                  content_type='image/gif')
+
+    def thumbnails(self, name):
+        """Имена файлов миниатюр картинки по записям kvstore."""
+        source = source_image(name)
+        keys = default.kvstore._get(source.key, identity='thumbnails')
+        return [default.kvstore._get(key).name for key in keys]
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(settings.MEDIA_ROOT, name))
+
+    def test_dry_run_only_counts(self):
+        """Пробный запуск находит сирот, но ничего не удаляет"""
+        stats = MediaCollector(dry_run=True, min_age=0).collect()
+        self.assertEqual(stats['images'], 3)
+        self.assertEqual(stats['orphan_images'], 1)
+        self.assertEqual(stats['orphan_thumbnails'],
+                         len(settings.POST_THUMBNAILS))
+        self.assertGreater(stats['bytes'], 0)
+        self.assertTrue(self.exists(self.orphan))
+        self.assertEqual(self.thumbnails(self.orphan),
+                         self.orphan_thumbnails)
+
+    def test_collect_removes_orphans_only(self):
+        """Удаляются сироты, их миниатюры и записи, а также миниатюры
+        без записей; картинки постов остаются"""
+        stray = 'cache/ab/cd/stray.jpg'
+        os.makedirs(os.path.dirname(os.path.join(settings.MEDIA_ROOT,
+                                                 stray)))
+        with open(os.path.join(settings.MEDIA_ROOT, stray), 'wb') as f:
+            f.write(SMALL_GIF)
+        stats = MediaCollector(min_age=0, batch_size=2).collect()
+        self.assertEqual(stats['orphan_thumbnails'],
+                         len(settings.POST_THUMBNAILS) + 1)
+        for name in (self.orphan, *self.orphan_thumbnails, stray):
+            self.assertFalse(self.exists(name), name)
+        self.assertIsNone(default.kvstore.get(source_image(self.orphan)))
+        self.assertTrue(self.exists(self.kept.image.name))
+        for name in self.thumbnails(self.kept.image.name):
+            self.assertTrue(self.exists(name), name)
+
+    def test_young_files_are_kept(self):
+        """Файлы моложе min_age не удаляются"""
+        stats = MediaCollector().collect()
+        self.assertEqual(stats['orphan_images'], 0)
+        self.assertTrue(self.exists(self.orphan))
@@ -0,0 +1,90 @@
+from itertools import count
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetTestMixin
+from posts import urls
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class PostsQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author, group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        post_kwargs = {'post_id': cls.post.id}
+        author_kwargs = {'username': cls.author.username}
+        # Имя маршрута -> (клиент, kwargs). Новый маршрут в posts.urls
+        # нужно добавить сюда, иначе тест упадёт.
+        cls.routes = {
+            'index': ('reader', {}),
+            'group_list': ('reader', {'slug': cls.group.slug}),
+            'profile': ('reader', author_kwargs),
+            'post_detail': ('reader', post_kwargs),
+            'post_create': ('reader', {}),
+            'post_edit': ('author', post_kwargs),
+            'add_comment': ('reader', post_kwargs),
+            'comments_more': ('reader', post_kwargs),
+            'follow_index': ('reader', {}),
+            'profile_follow': ('reader', author_kwargs),
+            'profile_unfollow': ('reader', author_kwargs),
+            'search': ('reader', {}),
+            'api_feed': ('reader', {}),
+            'api_post': ('reader', post_kwargs),
+            'api_group_feed': ('reader', {'slug': cls.group.slug}),
+            'api_author_feed': ('reader', author_kwargs),
+        }
+        cls.params = {'search': {'q': 'Тестовый'}}
+        cls.usernames = count()
+
+    def setUp(self):
+        cache.clear()
+        self.clients = {'reader': Client(), 'author': Client()}
+        self.clients['reader'].force_login(self.reader)
+        self.clients['author'].force_login(self.author)
+
+    def grow(self):
+        """Заполняет страницу постами и комментариями разных авторов."""
+        for _ in range(settings.NUM_OF_POSTS):
+            post = Post.objects.create(text='Тестовый текст',
+                                       author=self.author, group=self.group)
+            for target in (post, self.post):
+                Comment.objects.create(
+                    post=target,
+                    author=User.objects.create_user(
+                        username=f'commenter{next(self.usernames)}'),
+                    text='Комментарий',
+                )
+
+    def test_every_route_is_covered(self):
+        """Для каждого маршрута posts.urls задан способ его открыть"""
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(self.routes))
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        """Число запросов не растёт вместе с числом объектов на странице"""
+        for name, (client, kwargs) in self.routes.items():
+            with self.subTest(name=name):
+                url = reverse(f'posts:{name}', kwargs=kwargs)
+
+                def fetch():
+                    cache.clear()
+                    self.clients[client].get(url, self.params.get(name))
+
+                # Каждый маршрут проверяется на исходных данных.
+                with transaction.atomic():
+                    self.assertQueryCountStable(fetch, self.grow, msg=name)
+                    transaction.set_rollback(True)
@@ -0,0 +1,143 @@
+from urllib.parse import parse_qsl, urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import QueryPlanTestMixin
+from posts.models import Comment, Follow, Group, Post, User
+
+# Общая лента без условий: первые LIMIT строк индекса по дате.
+FEED_WALK = r'^SCAN posts_post USING (COVERING )?INDEX post_pub_date_idx$'
+# Выдача поиска: найденные MATCH строки сортируются по bm25, индекса по
+# релевантности не бывает.
+RELEVANCE_SORT = r'^USE TEMP B-TREE FOR ORDER BY$'
+
+
+class PostsQueryPlanTest(QueryPlanTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        for i in range(settings.NUM_OF_POSTS * 2):
+            cls.post = Post.objects.create(text=f'Тестовый текст {i}',
+                                           author=cls.author,
+                                           group=cls.group)
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def pages(self, name, kwargs=None, params=None):
+        """Первая и вторая страница маршрута: по номеру и по курсору."""
+        url = reverse(f'posts:{name}', kwargs=kwargs)
+        response = self.client.get(url, params)
+        page = response.context['page_obj']
+        yield url, params
+        if getattr(page, 'is_cursor', False):
+            if page.has_next():
+                yield url, {**(params or {}), 'after': page.next_cursor}
+        elif page.has_next():
+            yield url, {**(params or {}), 'page': 2}
+
+    def api_pages(self, name, kwargs=None, key=None):
+        """Первая, следующая и предыдущая страницы API по ссылкам next и
+        previous; key — ключ ответа со страницей."""
+
+        def page(params=None):
+            data = self.client.get(url, params).json()
+            return data[key] if key else data
+
+        url = reverse(f'posts:{name}', kwargs=kwargs)
+        yield url, None
+        link = page()['next']
+        self.assertIsNotNone(link, f'{name}: одна страница')
+        after = dict(parse_qsl(urlsplit(link).query))
+        yield url, after
+        link = page(after)['previous']
+        yield url, dict(parse_qsl(urlsplit(link).query))
+
+    def assertPagesIndexed(self, name, pages, limited=()):
+        for url, page_params in list(pages):
+            with self.subTest(name=name, params=page_params):
+                cache.clear()
+                self.assertIndexedQueries(
+                    lambda: self.client.get(url, page_params),
+                    msg=f'{name} {page_params}', limited=limited)
+
+    def assertRouteIndexed(self, name, kwargs=None, params=None,
+                           limited=()):
+        self.assertPagesIndexed(name, self.pages(name, kwargs, params),
+                                limited)
+
+    def test_feeds(self):
+        """Ленты читаются по индексам без сортировки во временном B-дереве"""
+        self.assertRouteIndexed('index', limited=(FEED_WALK,))
+        self.assertRouteIndexed('group_list', {'slug': self.group.slug})
+        self.assertRouteIndexed('group_list', {'slug': self.group.slug},
+                                {'sort': 'activity'})
+        self.assertRouteIndexed('profile',
+                                {'username': self.author.username})
+        self.assertRouteIndexed('follow_index')
+
+    @override_settings(PAGINATION_MODE='cursor')
+    def test_cursor_feeds(self):
+        """Курсорные страницы лент используют те же индексы"""
+        self.assertRouteIndexed('index', limited=(FEED_WALK,))
+        self.assertRouteIndexed('group_list', {'slug': self.group.slug})
+        self.assertRouteIndexed('group_list', {'slug': self.group.slug},
+                                {'sort': 'activity'})
+        self.assertRouteIndexed('profile',
+                                {'username': self.author.username})
+
+    def test_search(self):
+        """Поиск находит строки через MATCH по FTS, а посты выдачи
+        загружаются по первичному ключу"""
+        self.assertRouteIndexed('search', params={'q': 'Тестовый текст'},
+                                limited=(RELEVANCE_SORT,))
+
+    @override_settings(API_PAGE_SIZE=settings.NUM_OF_POSTS,
+                       COMMENTS_PER_PAGE=1)
+    def test_api_feeds(self):
+        """Ленты API и их курсорные страницы идут по индексам"""
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Ещё комментарий')
+        self.assertPagesIndexed('api_feed', self.api_pages('api_feed'),
+                                limited=(FEED_WALK,))
+        kwargs = {'slug': self.group.slug}
+        self.assertPagesIndexed(
+            'api_group_feed', self.api_pages('api_group_feed', kwargs))
+        kwargs = {'username': self.author.username}
+        self.assertPagesIndexed(
+            'api_author_feed', self.api_pages('api_author_feed', kwargs))
+        kwargs = {'post_id': self.post.id}
+        self.assertPagesIndexed(
+            'api_post', self.api_pages('api_post', kwargs, 'comments'))
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_timeline_merge_of_popular_authors(self):
+        """Посты популярных авторов подмешиваются в ленту по индексу"""
+        self.assertRouteIndexed('follow_index')
+
+    def test_post_detail_and_comments(self):
+        """Страница поста и подгрузка комментариев идут по индексам"""
+        kwargs = {'post_id': self.post.id}
+        self.assertIndexedQueries(
+            lambda: self.client.get(reverse('posts:post_detail',
+                                            kwargs=kwargs)),
+            msg='post_detail')
+        self.assertIndexedQueries(
+            lambda: self.client.get(reverse('posts:comments_more',
+                                            kwargs=kwargs)),
+            msg='comments_more')
@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.db_router import PIN_COOKIE
+from core.query_budget import QueryRecorder
+from core.testing import ReplicaTestMixin
+from posts.models import Group, Post, User
+
+
+class ReplicaRoutingTest(ReplicaTestMixin, TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        self.post = Post.objects.create(text='Тестовый текст',
+                                        author=self.author, group=self.group)
+        super().setUp()
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def texts(self, client, url):
+        return [post.text for post in client.get(url).context['page_obj']]
+
+    def test_reads_go_to_replica(self):
+        """Ленты читаются с реплики и видят записи после синхронизации"""
+        Post.objects.create(text='Ещё не на реплике', author=self.author)
+        url = reverse('posts:index')
+        self.assertEqual(self.texts(self.guest_client, url),
+                         ['Тестовый текст'])
+        self.sync_replicas()
+        self.assertEqual(self.texts(self.guest_client, url),
+                         ['Ещё не на реплике', 'Тестовый текст'])
+
+    def test_replica_queries_are_recorded(self):
+        """Бюджет запросов учитывает и чтения с реплики"""
+        with QueryRecorder() as recorder:
+            self.guest_client.get(reverse('posts:index'))
+        self.assertTrue([sql for sql, _ in recorder.queries
+                         if 'posts_post' in sql])
+
+    def test_sessions_and_users_read_from_primary(self):
+        """Пользователь, созданный после копии, уже может войти"""
+        User.objects.create_user(username='newcomer')
+        client = Client()
+        client.force_login(User.objects.get(username='newcomer'))
+        response = client.get(reverse('posts:index'))
+        self.assertEqual(response.context['user'].username, 'newcomer')
+
+    def test_author_sees_own_post_after_redirect(self):
+        """После записи автор читает с default и видит свой пост"""
+        response = self.author_client.post(
+            reverse('posts:post_create'), {'text': 'Свежий пост'},
+            follow=True)
+        self.assertIn(PIN_COOKIE, self.author_client.cookies)
+        self.assertEqual(response.context['page_obj'][0].text, 'Свежий пост')
+        self.assertEqual(
+            self.texts(self.guest_client, reverse('posts:index')),
+            ['Тестовый текст'])
+
+    @override_settings(REPLICA_PIN_SECONDS=30)
+    def test_pin_expires(self):
+        """Cookie живёт REPLICA_PIN_SECONDS, без неё чтения идут на реплику"""
+        self.author_client.post(reverse('posts:post_create'),
+                                {'text': 'Свежий пост'})
+        self.assertEqual(self.author_client.cookies[PIN_COOKIE]['max-age'],
+                         30)
+        # Тестовый клиент не удаляет истёкшие cookie сам.
+        del self.author_client.cookies[PIN_COOKIE]
+        self.assertEqual(
+            self.texts(self.author_client, reverse('posts:index')),
+            ['Тестовый текст'])
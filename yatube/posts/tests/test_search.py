@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Путешествия',
+            slug='travel',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(text='Поездка на Байкал зимой',
+                                       author=cls.author, group=cls.group)
+        cls.other = Post.objects.create(text='Рецепт пирога',
+                                        author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': query, **params})
+        return response
+
+    def test_search_by_text_and_group_title(self):
+        """Поиск находит посты по тексту и по названию группы"""
+        for query in ('байкал', 'путешествия'):
+            with self.subTest(query=query):
+                self.assertEqual(list(self.search(query).context['page_obj']),
+                                 [self.post])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста"""
+        self.other.text = 'Рецепт пирога с брусникой'
+        self.other.save()
+        self.assertEqual(list(self.search('брусникой').context['page_obj']),
+                         [self.other])
+        self.other.delete()
+        self.assertEqual(list(self.search('брусникой').context['page_obj']),
+                         [])
+
+    def test_group_rename_is_indexed(self):
+        """Новое название группы попадает в индекс"""
+        self.group.title = 'Походы'
+        self.group.save()
+        self.assertEqual(list(self.search('походы').context['page_obj']),
+                         [self.post])
+
+    def test_results_are_paginated_by_cursor(self):
+        """Выдача листается курсором без повторов"""
+        for i in range(settings.NUM_OF_POSTS + 2):
+            Post.objects.create(text=f'Ёлка номер {i}', author=self.author)
+        first = self.search('ёлка').context['page_obj']
+        second = self.search('ёлка', after=first.next_cursor).context[
+            'page_obj']
+        self.assertEqual(len(first), settings.NUM_OF_POSTS)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+        back = self.search('ёлка', before=second.previous_cursor).context[
+            'page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по тому же индексу"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'байкал'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.post])
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import Client, SimpleTestCase, override_settings
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_identical_uploads_are_stored_once(self):
+        """Одинаковое содержимое — одно имя и один файл"""
+        first = default_storage.save('posts/a.GIF', ContentFile(b'same'))
+        second = default_storage.save('posts/b.gif', ContentFile(b'same'))
+        other = default_storage.save('posts/a.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^posts/([0-9a-f]{2})/\1[0-9a-f]{62}\.gif$')
+        directory = os.path.dirname(default_storage.path(first))
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_media_is_immutable(self):
+        """Медиафайлы отдаются с Cache-Control: immutable на год"""
+        name = default_storage.save('posts/a.gif', ContentFile(b'GIF89a'))
+        response = Client().get(default_storage.url(name))
+        self.assertEqual(b''.join(response.streaming_content), b'GIF89a')
+        for directive in ('immutable', 'public', 'max-age=31536000'):
+            self.assertIn(directive, response['Cache-Control'])
+
+    @override_settings(MEDIA_ACCEL_HEADER='X-Accel-Redirect',
+                       MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_proxy_serves_file(self):
+        """За прокси Django только указывает файл в заголовке"""
+        response = Client().get('/media/posts/ab/cd.jpg')
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/posts/ab/cd.jpg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(
+            Client().get('/media/posts/../../settings.py').status_code, 404)
@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+RATES = {
+    'post_create': {'user': (2, 1 / 60), 'ip': (100, 1)},
+    'add_comment': {'user': (2, 1 / 60), 'ip': (3, 1 / 60)},
+}
+
+
+@override_settings(THROTTLE_RATES=RATES)
+class ThrottleTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author)
+        cls.comment_url = reverse('posts:add_comment',
+                                  kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def comment(self, client):
+        return client.post(self.comment_url, {'text': 'Комментарий'})
+
+    def test_user_bucket(self):
+        """Сверх ёмкости корзины пользователя запись получает 429"""
+        for _ in range(2):
+            self.assertEqual(self.comment(self.author_client).status_code,
+                             302)
+        response = self.comment(self.author_client)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(Comment.objects.count(), 2)
+        # Чтение не ограничивается.
+        create = self.author_client.get(reverse('posts:post_create'))
+        self.assertEqual(create.status_code, 200)
+
+    def test_ip_bucket_is_shared_by_users(self):
+        """Корзина IP-адреса общая для всех пользователей с него"""
+        self.comment(self.author_client)
+        self.comment(self.author_client)
+        self.assertEqual(self.comment(self.reader_client).status_code, 302)
+        self.assertEqual(self.comment(self.reader_client).status_code, 429)
+        other_address = self.reader_client.post(
+            reverse('posts:post_create'), {'text': 'Пост'},
+            REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(other_address.status_code, 302)
+
+    def test_tokens_refill(self):
+        """Корзина пополняется со временем"""
+        now = 1000.0
+        with mock.patch('core.throttle.time.time', lambda: now):
+            self.comment(self.author_client)
+            self.comment(self.author_client)
+            self.assertEqual(self.comment(self.author_client).status_code,
+                             429)
+            now += 60
+            self.assertEqual(self.comment(self.author_client).status_code,
+                             302)
+
+    @override_settings(THROTTLE_WRITER_BUSY=0)
+    def test_busy_writer_sheds_all_writes(self):
+        """Медленная запись закрывает запись для всех на время"""
+        self.assertEqual(self.comment(self.author_client).status_code, 302)
+        response = self.reader_client.post(reverse('posts:post_create'),
+                                           {'text': 'Пост'})
+        self.assertEqual(response.status_code, 429)
+        self.assertLessEqual(int(response['Retry-After']),
+                             settings.THROTTLE_SHED_SECONDS)
+
+    @override_settings(THROTTLE_RATES={})
+    def test_scope_without_rates_is_not_limited(self):
+        """Область без записи в THROTTLE_RATES не ограничивается"""
+        for _ in range(5):
+            self.assertEqual(self.comment(self.author_client).status_code,
+                             302)
@@ -0,0 +1,68 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+
+from posts.models import Post, User
+from posts.thumbnails import missing_geometries, schedule_post_image
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user,
+            image=SimpleUploadedFile(name='small.gif', content=small_gif,
+                                     content_type='image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Хранилище ключей sorl кэширует записи в общем кэше.
+        cache.clear()
+
+    def test_missing_thumbnail_falls_back_to_original(self):
+        """Пока миниатюры нет, тег получает исходную картинку,
+        а построение ставится в очередь"""
+        geometry_string, options = settings.POST_THUMBNAILS[0]
+        with mock.patch('posts.thumbnails.schedule') as scheduled:
+            image = default.backend.get_thumbnail(
+                self.post.image, geometry_string, **options)
+        self.assertEqual(image.name, self.post.image.name)
+        scheduled.assert_called_once_with(self.post.image.name,
+                                          geometry_string, options)
+
+    def test_all_geometries_are_prebuilt(self):
+        """Все размеры из POST_THUMBNAILS строятся заранее"""
+        name = self.post.image.name
+        self.assertEqual(len(missing_geometries(name)),
+                         len(settings.POST_THUMBNAILS))
+        schedule_post_image(name)
+        self.assertEqual(missing_geometries(name), [])
+        geometry_string, options = settings.POST_THUMBNAILS[0]
+        thumbnail = default.backend.get_thumbnail(
+            self.post.image, geometry_string, **options)
+        self.assertNotEqual(thumbnail.name, name)
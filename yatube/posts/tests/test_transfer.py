@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts import counters
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class TransferCommandsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.posts = [Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                         group=cls.group if i % 2 else None)
+                     for i in range(5)]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'dump.jsonl')
+        self.checkpoint = os.path.join(directory.name, 'state.json')
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('id').values_list(
+                'id', 'text', 'pub_date', 'author__username', 'group__slug')),
+            list(Comment.objects.values_list('post_id', 'author__username',
+                                             'text', 'created')),
+            list(Follow.objects.values_list('user__username',
+                                            'author__username')),
+        )
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка в пустую базу сохраняют данные и даты"""
+        expected = self.snapshot()
+        call_command('export_posts', self.path, chunk_size=2,
+                     stdout=StringIO())
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        call_command('import_posts', self.path, batch_size=3,
+                     stdout=StringIO())
+        self.assertEqual(self.snapshot(), expected)
+        author = User.objects.get(username='author')
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(counters.get(counters.author_posts(author.pk)), 5)
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(), 5)
+
+    def test_import_is_idempotent(self):
+        """Повторная загрузка того же файла не создаёт дублей"""
+        call_command('export_posts', self.path, stdout=StringIO())
+        expected = self.snapshot()
+        call_command('import_posts', self.path, stdout=StringIO())
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_import_refuses_taken_ids(self):
+        """Id, занятые другими постами, не перезаписываются и не
+        получают чужие комментарии"""
+        call_command('export_posts', self.path, stdout=StringIO())
+        taken = self.posts[0]
+        Comment.objects.all().delete()
+        Post.objects.filter(pk=taken.pk).update(
+            pub_date=taken.pub_date - timedelta(days=1))
+        with self.assertRaises(CommandError):
+            call_command('import_posts', self.path, stdout=StringIO())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_export_resumes_from_checkpoint(self):
+        """Прерванная выгрузка продолжается без дублей и пропусков"""
+        call_command('export_posts', self.path, models=['group', 'post'],
+                     chunk_size=2, checkpoint=self.checkpoint,
+                     stdout=StringIO())
+        Post.objects.create(text='Новый пост', author=self.author)
+        call_command('export_posts', self.path, chunk_size=2,
+                     checkpoint=self.checkpoint,
+                     stdout=StringIO())
+        with open(self.path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        post_ids = [r['id'] for r in records if r['model'] == 'post']
+        self.assertEqual(post_ids,
+                         list(Post.objects.order_by('id')
+                              .values_list('id', flat=True)))
+        self.assertEqual(
+            [r['model'] for r in records].count('group'), 1)
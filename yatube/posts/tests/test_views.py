@@ -3,18 +3,25 @@ import tempfile
 
 from django import forms
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Comment, Group, Post, User
+from core.testing import OnCommitTestMixin
+from posts import feed_cache
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          User)
+from posts.utils import FeedPaginator
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 TEST_PAG_3 = 3
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostPagesTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -174,3 +181,279 @@ class PaginatorViewsTest(TestCase):
                                  settings.NUM_OF_POSTS)
                 response = self.authorized_client.get(revers_name + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), TEST_PAG_3)
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        for i in range(settings.NUM_OF_POSTS + TEST_PAG_3):
+            Post.objects.create(
+                text=f'Тестовый текст поста {i}',
+                author=cls.author,
+                group=cls.group
+            )
+        cls.paginator_page = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author}),
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    @override_settings(PAGINATION_MODE='cursor')
+    def test_cursor_pages_cover_feed_without_gaps(self):
+        """Курсорная пагинация проходит ленту вперёд и назад без пропусков"""
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        for revers_name in self.paginator_page:
+            with self.subTest(revers_name=revers_name):
+                first = self.guest_client.get(revers_name).context['page_obj']
+                self.assertFalse(first.has_previous())
+                self.assertEqual(list(first),
+                                 expected[:settings.NUM_OF_POSTS])
+                second = self.guest_client.get(
+                    revers_name, {'after': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(second),
+                                 expected[settings.NUM_OF_POSTS:])
+                self.assertFalse(second.has_next())
+                back = self.guest_client.get(
+                    revers_name, {'before': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.guest_client.get(reverse('posts:index'),
+                                         {'after': 'не-курсор'})
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.NUM_OF_POSTS)
+
+
+class ElidedPageRangeTest(TestCase):
+    def test_elided_page_range_is_windowed(self):
+        """Список страниц большой ленты сворачивается в окно"""
+        paginator = FeedPaginator(range(500000), settings.NUM_OF_POSTS)
+        page_range = list(paginator.get_elided_page_range(
+            25000, on_each_side=3, on_ends=2))
+        self.assertEqual(page_range, [
+            1, 2, paginator.ELLIPSIS,
+            24997, 24998, 24999, 25000, 25001, 25002, 25003,
+            paginator.ELLIPSIS, 49999, 50000,
+        ])
+
+    def test_short_feed_lists_every_page(self):
+        """Короткая лента показывает все страницы без пропусков"""
+        paginator = FeedPaginator(range(30), settings.NUM_OF_POSTS)
+        self.assertEqual(list(paginator.get_elided_page_range(2)),
+                         [1, 2, 3])
+
+
+class FollowViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+        self.stranger_client = Client()
+        self.stranger_client.force_login(self.stranger)
+
+    def follow(self):
+        self.follower_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+
+    def feed(self, client):
+        return list(client.get(reverse('posts:follow_index'))
+                    .context['page_obj'])
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют ленту подписчика"""
+        post = Post.objects.create(text='Старый пост', author=self.author)
+        self.follow()
+        self.assertTrue(Follow.objects.filter(user=self.follower,
+                                              author=self.author).exists())
+        self.assertEqual(self.feed(self.follower_client), [post])
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.feed(self.follower_client), [])
+
+    def test_new_post_reaches_only_followers(self):
+        """Новый пост появляется в ленте подписчиков и только у них"""
+        self.follow()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.feed(self.follower_client), [post])
+        self.assertEqual(self.feed(self.stranger_client), [])
+
+    @override_settings(TIMELINE_MAX_LENGTH=3)
+    def test_timeline_is_capped(self):
+        """Материализованная лента обрезается до TIMELINE_MAX_LENGTH"""
+        self.follow()
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 3)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        self.follow()
+        posts = [Post.objects.create(text=f'Пост {i}', author=self.author)
+                 for i in range(settings.NUM_OF_POSTS + TEST_PAG_3)]
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj),
+                         posts[::-1][:settings.NUM_OF_POSTS])
+        response = self.follower_client.get(reverse('posts:follow_index'),
+                                            {'after': page_obj.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), TEST_PAG_3)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_demoted_author_stays_in_timeline(self):
+        """Автор, опустившийся до порога, остаётся в лентах подписчиков"""
+        self.follow()
+        Follow.objects.create(user=self.stranger, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.stranger_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertEqual(self.feed(self.follower_client), [post])
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 1)
+
+
+class FeedCacheTest(OnCommitTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        cls.feeds = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_new_post_invalidates_feed_fragments(self):
+        """Новый пост сразу виден в закэшированных лентах"""
+        for url in self.feeds:
+            self.guest_client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(text='Свежий пост', author=self.author,
+                                group=self.group)
+        for url in self.feeds:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Свежий пост')
+
+    def test_deleted_post_leaves_feed_fragments(self):
+        """Удалённый пост пропадает из закэшированных лент"""
+        post = Post.objects.create(text='Удаляемый пост', author=self.author,
+                                   group=self.group)
+        for url in self.feeds:
+            self.assertContains(self.guest_client.get(url), 'Удаляемый пост')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        for url in self.feeds:
+            with self.subTest(url=url):
+                self.assertNotContains(self.guest_client.get(url),
+                                       'Удаляемый пост')
+
+    def test_versions_change_after_commit(self):
+        """Версии лент меняются только после коммита записи: до него
+        параллельный запрос сохранил бы старые строки под новой версией"""
+        scopes = feed_cache.post_scopes(self.author.pk, self.group.pk)
+        before = feed_cache.get_versions(*scopes)
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = Post.objects.create(text='Пост', author=self.author,
+                                       group=self.group)
+            Comment.objects.create(post=post, author=self.author,
+                                   text='Комментарий')
+        self.assertEqual(feed_cache.get_versions(*scopes), before)
+        for callback in callbacks:
+            callback()
+        for old, new in zip(before, feed_cache.get_versions(*scopes)):
+            self.assertGreater(new, old)
+
+    def test_fragments_vary_by_page(self):
+        """Каждая страница ленты кэшируется отдельно"""
+        for i in range(settings.NUM_OF_POSTS + TEST_PAG_3):
+            Post.objects.create(text=f'Пост номер {i}.', author=self.author,
+                                group=self.group)
+        for url in self.feeds:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url),
+                                    f'Пост номер {TEST_PAG_3}.')
+                second = self.guest_client.get(url, {'page': 2})
+                self.assertContains(second, 'Пост номер 0.')
+                self.assertNotContains(second, f'Пост номер {TEST_PAG_3}.')
+
+
+class PostDetailCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author)
+        cls.url = reverse('posts:post_detail', kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        # Первый запрос кладёт пользователя в кэш (core.auth).
+        self.authorized_client.get(reverse('about:author'))
+
+    def add_comments(self, count):
+        start = Comment.objects.count()
+        for i in range(start, start + count):
+            Comment.objects.create(
+                post=self.post,
+                author=User.objects.create_user(username=f'reader{i}'),
+                text=f'Комментарий {i}',
+            )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(self.url)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_comments(self):
+        """Число запросов post_detail не зависит от числа комментариев"""
+        self.add_comments(3)
+        few = self.count_queries()
+        self.add_comments(settings.COMMENTS_PER_PAGE * 2)
+        self.assertEqual(self.count_queries(), few)
+
+    def test_load_more_returns_next_batch(self):
+        """«Показать ещё» отдаёт только следующую порцию комментариев"""
+        self.add_comments(settings.COMMENTS_PER_PAGE + TEST_PAG_3)
+        comments = self.authorized_client.get(self.url).context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        response = self.authorized_client.get(
+            reverse('posts:comments_more', kwargs={'post_id': self.post.id}),
+            {'after': comments.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(len(response.context['comments']), TEST_PAG_3)
+        self.assertFalse(response.context['comments'].has_next())
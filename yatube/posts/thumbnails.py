@@ -0,0 +1,133 @@
+"""Заблаговременная генерация миниатюр картинок постов.
+
+Все размеры из POST_THUMBNAILS строятся в фоновом пуле потоков, как только
+posts.images обработает картинку сохранённого поста. Тег {% thumbnail %}
+при этом не меняется: бэкенд только ищет готовую миниатюру в хранилище
+ключей sorl, а пока её нет, ставит задачу в пул и отдаёт исходную картинку.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.query_budget import unrecorded
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def source_image(file_):
+    """Исходная картинка для sorl. Строку sorl связал бы с
+    THUMBNAIL_STORAGE, а картинки постов лежат в хранилище по умолчанию
+    Django; от класса хранилища зависят ключ kvstore и имена миниатюр."""
+    return ImageFile(file_, getattr(file_, 'storage', default_storage))
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который не строит миниатюры во время запроса."""
+
+    def _options(self, source, options):
+        # Те же умолчания, что в ThumbnailBackend.get_thumbnail: от них
+        # зависит имя файла миниатюры.
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None, без чтения исходной картинки."""
+        source = source_image(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._options(source, options))
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self.lookup(file_, geometry_string, **options)
+        if thumbnail:
+            return thumbnail
+        schedule(getattr(file_, 'name', file_), geometry_string, options)
+        return source_image(file_)
+
+    def generate(self, file_, geometry_string, **options):
+        return super().get_thumbnail(source_image(file_), geometry_string,
+                                     **options)
+
+
+def _generate(name, geometry_string, options, task):
+    try:
+        default.backend.generate(name, geometry_string, **options)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s %s',
+                         name, geometry_string)
+    finally:
+        with _lock:
+            _pending.discard(task)
+
+
+def _run_in_worker(func, *args):
+    try:
+        func(*args)
+    finally:
+        # У потока пула своё соединение с базой, его нужно закрыть.
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def schedule(name, geometry_string, options):
+    """Ставит построение миниатюры в пул; повторы одной задачи
+    схлопываются, пока она не выполнена."""
+    task = (name, geometry_string, tuple(sorted(options.items())))
+    with _lock:
+        if task in _pending:
+            return
+        _pending.add(task)
+    submit(_generate, name, geometry_string, options, task)
+
+
+def submit(func, *args):
+    """Выполняет func в фоновом пуле, а при THUMBNAIL_WORKERS = 0 — сразу."""
+    if not settings.THUMBNAIL_WORKERS:
+        with unrecorded():
+            func(*args)
+        return
+    _get_executor().submit(_run_in_worker, func, *args)
+
+
+def schedule_post_image(name):
+    for geometry_string, options in settings.POST_THUMBNAILS:
+        schedule(name, geometry_string, options)
+
+
+def missing_geometries(name):
+    """Размеры из POST_THUMBNAILS, для которых миниатюры ещё нет."""
+    return [(geometry_string, options)
+            for geometry_string, options in settings.POST_THUMBNAILS
+            if not default.backend.lookup(name, geometry_string, **options)]
@@ -0,0 +1,192 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост автора сразу раскладывается в TimelineEntry каждого подписчика,
+поэтому чтение ленты — это поиск по индексу (user, pub_date) без соединения
+с подписками. У авторов, чьих подписчиков больше TIMELINE_FANOUT_LIMIT,
+раскладка не делается: их посты подмешиваются в ленту при чтении. Когда
+такой автор опускается до порога, его посты раскладываются по лентам всех
+подписчиков (demote), иначе они пропали бы из лент.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from . import counters
+from .models import Counter, Follow, Post, TimelineEntry
+from .utils import (CURSOR_ORDERING, CursorPage, CursorPaginator,
+                    reverse_ordering, seek_filter)
+
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+
+
+def is_popular(author_id):
+    return (counters.get(counters.followers(author_id))
+            > settings.TIMELINE_FANOUT_LIMIT)
+
+
+def popular_followed_authors(user):
+    """Авторы из подписок user, чьи посты не раскладываются по лентам."""
+    keys = {counters.followers(author_id): author_id
+            for author_id in Follow.objects.filter(user=user)
+            .values_list('author_id', flat=True)}
+    popular = Counter.objects.filter(
+        key__in=keys, value__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('key', flat=True)
+    return [keys[key] for key in popular]
+
+
+def trim(user_ids):
+    """Обрезает ленты пользователей до TIMELINE_MAX_LENGTH записей."""
+    limit = settings.TIMELINE_MAX_LENGTH
+    overflowed = (TimelineEntry.objects.filter(user__in=user_ids)
+                  .order_by().values('user')
+                  .annotate(total=Count('pk')).filter(total__gt=limit)
+                  .values_list('user', flat=True))
+    for user_id in overflowed:
+        entries = TimelineEntry.objects.filter(user=user_id)
+        cutoff = (entries.order_by(*TIMELINE_ORDERING)
+                  .values_list('pub_date', 'post_id')[limit - 1])
+        entries.filter(seek_filter(TIMELINE_ORDERING, cutoff)).delete()
+
+
+def push(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_popular(post.author_id):
+        return
+    follower_ids = list(Follow.objects.filter(author=post.author_id)
+                        .values_list('user_id', flat=True).distinct())
+    if not follower_ids:
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids),
+        ignore_conflicts=True,
+    )
+    trim(follower_ids)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if is_popular(author_id):
+        return
+    posts = (Post.objects.filter(author=author_id).order_by(*CURSOR_ORDERING)
+             .values_list('id', 'pub_date')[:settings.TIMELINE_MAX_LENGTH])
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def demote(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков,
+    если после отписки он перестал быть популярным: его посты больше не
+    подмешиваются при чтении."""
+    if (counters.get(counters.followers(author_id))
+            != settings.TIMELINE_FANOUT_LIMIT):
+        return
+    entries = TimelineEntry._meta.db_table
+    with connection.cursor() as cursor:
+        # Одним запросом: до TIMELINE_FANOUT_LIMIT × TIMELINE_MAX_LENGTH
+        # строк не проходят через Python.
+        cursor.execute(
+            f'INSERT OR IGNORE INTO {entries} (user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f, ('
+            f'SELECT id, pub_date FROM {Post._meta.db_table} '
+            f'WHERE author_id = %s ORDER BY pub_date DESC, id DESC '
+            f'LIMIT %s) AS p WHERE f.author_id = %s',
+            [author_id, settings.TIMELINE_MAX_LENGTH, author_id])
+    trim(Follow.objects.filter(author=author_id)
+         .values_list('user_id', flat=True))
+
+
+def rebuild():
+    """Заново строит все ленты одним запросом — после массовой загрузки,
+    когда сигналы не срабатывали."""
+    popular = [int(key.split(':')[1]) for key in Counter.objects.filter(
+        key__startswith=counters.followers(''),
+        value__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('key', flat=True)]
+    excluded = ''
+    if popular:
+        excluded = (f'WHERE f.author_id NOT IN '
+                    f'({", ".join(map(str, popular))})')
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.all().delete()
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            f'(user_id, post_id, pub_date) '
+            f'SELECT user_id, post_id, pub_date FROM ('
+            f'SELECT f.user_id AS user_id, p.id AS post_id, '
+            f'p.pub_date AS pub_date, ROW_NUMBER() OVER ('
+            f'PARTITION BY f.user_id ORDER BY p.pub_date DESC, p.id DESC'
+            f') AS position FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            f'{excluded}) AS entries WHERE position <= %s',
+            [settings.TIMELINE_MAX_LENGTH])
+        return cursor.rowcount
+
+
+def remove(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user=user_id,
+                                 post__author=author_id).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная пагинация ленты подписок.
+
+    Ключи страницы берутся из материализованной ленты и из постов
+    популярных авторов, сливаются по (pub_date, id), после чего посты
+    загружаются одним запросом.
+    """
+
+    def __init__(self, user, per_page, merge_all=False):
+        super().__init__(Post.objects.select_related('author', 'group'),
+                         per_page, CURSOR_ORDERING)
+        self.user = user
+        self.merge_all = merge_all
+
+    def _streams(self):
+        if self.merge_all:
+            authors = (Follow.objects.filter(user=self.user)
+                       .values_list('author_id', flat=True))
+            yield Post.objects.filter(author__in=authors), CURSOR_ORDERING
+            return
+        yield (TimelineEntry.objects.filter(user=self.user),
+               TIMELINE_ORDERING)
+        popular = popular_followed_authors(self.user)
+        if popular:
+            yield Post.objects.filter(author__in=popular), CURSOR_ORDERING
+
+    def _keys(self, cursor, forward):
+        keys = set()
+        for queryset, ordering in self._streams():
+            if cursor is not None:
+                queryset = queryset.filter(
+                    seek_filter(ordering, cursor, forward))
+            if not forward:
+                ordering = reverse_ordering(ordering)
+            fields = [name.lstrip('-') for name in ordering]
+            keys.update(queryset.order_by(*ordering)
+                        .values_list(*fields)[:self.per_page + 1])
+        return sorted(keys, reverse=forward)[:self.per_page + 1]
+
+    def _posts(self, keys):
+        posts = self.object_list.in_bulk([post_id for _, post_id in keys])
+        return [posts[post_id] for _, post_id in keys if post_id in posts]
+
+    def page(self, after=None, before=None):
+        if before is not None:
+            keys = self._keys(before, forward=False)
+            if keys:
+                has_previous = len(keys) > self.per_page
+                keys = keys[:self.per_page][::-1]
+                return CursorPage(self._posts(keys), self, True,
+                                  has_previous)
+            after = None
+        keys = self._keys(after, forward=True)
+        return CursorPage(self._posts(keys[:self.per_page]), self,
+                          len(keys) > self.per_page, after is not None)
@@ -0,0 +1,94 @@
+"""Формат JSON Lines для команд export_posts и import_posts.
+
+Каждая строка — объект с полем "model" (group, post, comment, follow).
+Пользователи и группы передаются естественными ключами (username, slug),
+посты и комментарии — вместе со своими id, чтобы комментарии после
+загрузки ссылались на те же посты.
+"""
+import datetime
+import json
+import os
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post
+
+MODELS = ('group', 'post', 'comment', 'follow')
+
+# model -> (queryset, поля values(), имена полей в файле)
+EXPORTS = {
+    'group': (Group.objects, ('id', 'slug', 'title', 'description'),
+              ('id', 'slug', 'title', 'description')),
+    'post': (Post.objects, ('id', 'text', 'pub_date', 'author__username',
+                            'group__slug', 'image'),
+             ('id', 'text', 'pub_date', 'author', 'group', 'image')),
+    'comment': (Comment.objects, ('id', 'post_id', 'author__username',
+                                  'text', 'created'),
+                ('id', 'post', 'author', 'text', 'created')),
+    'follow': (Follow.objects, ('id', 'user__username', 'author__username'),
+               ('id', 'user', 'author')),
+}
+
+
+class TransferEncoder(DjangoJSONEncoder):
+    """Даты без округления до миллисекунд: по pub_date листаются ленты."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dump(model, row):
+    data = {'model': model}
+    data.update(zip(EXPORTS[model][2], row))
+    return json.dumps(data, cls=TransferEncoder, ensure_ascii=False)
+
+
+def parse_date(value):
+    return parse_datetime(value) if value else None
+
+
+class Checkpoint:
+    """Позиция, с которой можно продолжить прерванную выгрузку/загрузку."""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def get(self, key, default=None):
+        return self.state.get(key, default)
+
+    def save(self, **state):
+        self.state.update(state)
+        if not self.path:
+            return
+        # Запись через временный файл, чтобы обрыв не испортил checkpoint.
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+
+class Throughput:
+    """Считает строки и пишет скорость обработки не чаще раза в секунду."""
+
+    def __init__(self, stdout, interval=1.0):
+        self.stdout = stdout
+        self.interval = interval
+        self.started = self.reported = time.monotonic()
+        self.rows = 0
+
+    def add(self, rows, force=False):
+        self.rows += rows
+        now = time.monotonic()
+        if force or now - self.reported >= self.interval:
+            self.reported = now
+            elapsed = max(now - self.started, 1e-9)
+            self.stdout.write(f'{self.rows} строк, '
+                              f'{self.rows / elapsed:.0f} строк/с')
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -13,4 +13,18 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.comments_more,
+         name='comments_more'),
+    path('search/', views.search, name='search'),
+    path('follow/', views.follow_index, name='follow_index'),
+    path('profile/<str:username>/follow/', views.profile_follow,
+         name='profile_follow'),
+    path('profile/<str:username>/unfollow/', views.profile_unfollow,
+         name='profile_unfollow'),
+    path('api/v1/posts/', api.feed, name='api_feed'),
+    path('api/v1/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path('api/v1/groups/<slug:slug>/posts/', api.group_feed,
+         name='api_group_feed'),
+    path('api/v1/authors/<str:username>/posts/', api.author_feed,
+         name='api_author_feed'),
 ]
@@ -1,9 +1,324 @@
+import base64
+import binascii
+import collections.abc
+import contextlib
+import datetime
+import json
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+# Порядок ленты для курсорной пагинации: последний столбец должен быть
+# уникальным, иначе посты с одинаковой датой будут теряться между страницами.
+CURSOR_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('-created', '-id')
+
+
+def _field_name(name):
+    return name.lstrip('-')
+
+
+def _value(obj, name):
+    """Достаёт значение поля как из модели, так и из строки values()."""
+    if isinstance(obj, dict):
+        return obj[name]
+    return getattr(obj, name)
+
+
+def encode_cursor(values):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    data = [value.isoformat() if isinstance(value, datetime.datetime)
+            else value for value in values]
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_raw_cursor(token, length):
+    """Список из length значений токена без приведения типов или None."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if not isinstance(data, list) or len(data) != length:
+        return None
+    return data
+
+
+def decode_cursor(token, model, ordering):
+    """Распаковывает токен; для испорченного токена возвращает None."""
+    data = decode_raw_cursor(token, len(ordering))
+    if data is None:
+        return None
+    try:
+        return [model._meta.get_field(_field_name(name)).to_python(value)
+                for name, value in zip(ordering, data)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def reverse_ordering(ordering):
+    return tuple(name[1:] if name.startswith('-') else f'-{name}'
+                 for name in ordering)
+
+
+def seek_filter(ordering, values, forward=True):
+    """Условие «строго после курсора» в заданном порядке сортировки.
+
+    Первый столбец дополнительно ограничен нестрогим неравенством, чтобы
+    СУБД могла начать поиск по индексу, а не перебирать ленту с начала.
+    """
+    lookups = []
+    for name in ordering:
+        descending = name.startswith('-')
+        lookups.append('lt' if descending == forward else 'gt')
+    first = _field_name(ordering[0])
+    condition = Q()
+    for i, name in enumerate(ordering):
+        step = Q(**{f'{_field_name(name)}__{lookups[i]}': values[i]})
+        for prev_name, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{_field_name(prev_name): prev_value})
+        condition |= step
+    bound = Q(**{f'{first}__{lookups[0]}e': values[0]})
+    return bound & condition
+
+
+class FeedPage(Page):
+    @property
+    def elided_page_range(self):
+        return self.paginator.get_elided_page_range(
+            self.number,
+            on_each_side=settings.PAGINATOR_ON_EACH_SIDE,
+            on_ends=settings.PAGINATOR_ON_ENDS,
+        )
+
+
+class FeedPaginator(Paginator):
+    """Paginator с «окном» номеров страниц вместо полного page_range."""
+
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            # Готовое значение из счётчика вместо SELECT COUNT(*).
+            self.count = count
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        """Первые и последние on_ends страниц и ±on_each_side вокруг
+        текущей; пропуски обозначаются ELLIPSIS."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def _get_page(self, *args, **kwargs):
+        return FeedPage(*args, **kwargs)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator без полного COUNT(*) по большой таблице (для админки).
+
+    Без фильтров число строк даёт estimate() — например, счётчик из
+    posts.counters. С фильтрами строки считаются не дальше
+    ADMIN_COUNT_LIMIT: хвост длинной выборки недоступен по номерам
+    страниц, зато подсчёт не проходит её целиком.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, estimate=None):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        if self.estimate is not None and not self.object_list.query.where:
+            return self.estimate()
+        return self.object_list[:settings.ADMIN_COUNT_LIMIT].count()
+
+
+def date_bounds(year, month=None, day=None):
+    """Начало и конец (не включительно) года, месяца или дня в текущем
+    часовом поясе."""
+    start = datetime.datetime(int(year), int(month or 1), int(day or 1))
+    if day:
+        end = start + datetime.timedelta(days=1)
+    elif month:
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    else:
+        end = start.replace(year=start.year + 1)
+    if settings.USE_TZ:
+        start, end = timezone.make_aware(start), timezone.make_aware(end)
+    return start, end
+
+
+def _local_date(value):
+    if settings.USE_TZ:
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def date_range(queryset, field_name):
+    """Первая и последняя даты поля: два поиска по индексу. Min и Max в
+    одном запросе SQLite считает проходом по всем строкам."""
+    values = queryset.values_list(field_name, flat=True)
+    first = values.order_by(field_name).first()
+    if first is None:
+        return None, None
+    last = values.order_by(f'-{field_name}').first()
+    return _local_date(first), _local_date(last)
+
+
+def distinct_dates(queryset, field_name, kind):
+    """Как queryset.dates(field_name, kind), но без DISTINCT по всем
+    строкам: каждый следующий год, месяц или день находится одним поиском
+    по индексу поля, начиная с конца предыдущего."""
+    values = queryset.values_list(field_name, flat=True).order_by(field_name)
+    dates = []
+    value = values.first()
+    while value is not None:
+        date = _local_date(value)
+        if kind == 'year':
+            date = date.replace(month=1, day=1)
+            end = date_bounds(date.year)[1]
+        elif kind == 'month':
+            date = date.replace(day=1)
+            end = date_bounds(date.year, date.month)[1]
+        else:
+            end = date_bounds(date.year, date.month, date.day)[1]
+        dates.append(date)
+        value = values.filter(**{f'{field_name}__gte': end}).first()
+    return dates
+
+
+class CursorPage(collections.abc.Sequence):
+    """Страница курсорной пагинации, совместимая с Page по интерфейсу."""
+
+    is_cursor = True
+    number = None
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        if not isinstance(index, (int, slice)):
+            raise TypeError
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def _cursor(self, obj):
+        return encode_cursor([_value(obj, _field_name(name))
+                              for name in self.paginator.ordering])
+
+    @property
+    def next_cursor(self):
+        if not self.has_next() or not self.object_list:
+            return None
+        return self._cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        return self._cursor(self.object_list[0])
+
+
+class CursorPaginator:
+    """Пагинация по ключу (keyset): без OFFSET и без COUNT(*)."""
+
+    def __init__(self, object_list, per_page, ordering=CURSOR_ORDERING):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def page(self, after=None, before=None):
+        queryset = self.object_list
+        if before is not None:
+            backward = reverse_ordering(self.ordering)
+            rows = list(
+                queryset.filter(seek_filter(self.ordering, before,
+                                            forward=False))
+                .order_by(*backward)[:self.per_page + 1]
+            )
+            if rows:
+                has_previous = len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+                return CursorPage(rows, self, True, has_previous)
+            after = None
+        if after is not None:
+            queryset = queryset.filter(seek_filter(self.ordering, after))
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        return CursorPage(rows[:self.per_page], self,
+                          len(rows) > self.per_page, after is not None)
+
+    def get_page(self, after_token=None, before_token=None):
+        """Как Paginator.get_page: испорченный курсор даёт первую страницу."""
+        model = self.object_list.model
+        after = before = None
+        if before_token:
+            before = decode_cursor(before_token, model, self.ordering)
+        elif after_token:
+            after = decode_cursor(after_token, model, self.ordering)
+        return self.page(after=after, before=before)
+
+
+@contextlib.contextmanager
+def explicit_dates(*fields):
+    """Временно отключает auto_now и auto_now_add, чтобы задать даты самому."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
 
 
-def get_pages(request, post_list):
-    paginator = Paginator(post_list, settings.NUM_OF_POSTS)
+def get_pages(request, post_list, ordering=CURSOR_ORDERING, count=None):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if settings.PAGINATION_MODE == 'cursor' or after or before:
+        paginator = CursorPaginator(post_list, settings.NUM_OF_POSTS,
+                                    ordering)
+        return paginator.get_page(after, before)
+    paginator = FeedPaginator(post_list.order_by(*ordering),
+                              settings.NUM_OF_POSTS, count=count)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
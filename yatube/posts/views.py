@@ -1,43 +1,95 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.throttle import throttle
+
+from . import counters, feed_cache
+from .activity import ACTIVITY_ORDERING, with_activity
+from .conditional import (condition, group_state, index_state, post_state,
+                          profile_state)
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User
-from .utils import get_pages
+from .models import Follow, Group, Post, User
+from .search import SearchPaginator
+from .timeline import TimelinePaginator
+from .utils import (COMMENT_ORDERING, CURSOR_ORDERING, CursorPaginator,
+                    get_pages)
 
 
+@condition(index_state)
 def index(request):
-    posts = Post.objects.select_related('group')
+    posts = with_activity(Post.objects.select_related('author', 'group'))
+    count = counters.get(counters.ALL_POSTS)
     return render(request, 'posts/index.html',
-                  {'page_obj': get_pages(request, posts)})
+                  {'page_obj': get_pages(request, posts, count=count),
+                   'index': True,
+                   **feed_cache.fragment_context(request, feed_cache.INDEX)})
 
 
+@condition(group_state)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author')
+    posts = with_activity(group.posts.select_related('author'))
+    count = counters.get(counters.group_posts(group.pk))
+    by_activity = request.GET.get('sort') == 'activity'
+    ordering = ACTIVITY_ORDERING if by_activity else CURSOR_ORDERING
     return render(request, 'posts/group_list.html',
                   {'group': group,
-                   'page_obj': get_pages(request, posts)})
+                   'page_obj': get_pages(request, posts, ordering, count),
+                   'by_activity': by_activity,
+                   'query_string': 'sort=activity&' if by_activity else '',
+                   **feed_cache.fragment_context(
+                       request, feed_cache.group_scope(group.pk))})
 
 
+@condition(profile_state)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    posts = with_activity(author.posts.select_related('group'))
+    posts_count = counters.get(counters.author_posts(author.pk))
+    following = (request.user.is_authenticated
+                 and Follow.objects.filter(user=request.user,
+                                           author=author).exists())
     return render(request, 'posts/profile.html',
-                  {'page_obj': get_pages(request, posts),
-                   'author': author})
+                  {'page_obj': get_pages(request, posts, count=posts_count),
+                   'author': author,
+                   'posts_count': posts_count,
+                   'following': following,
+                   **feed_cache.fragment_context(
+                       request, feed_cache.author_scope(author.pk))})
+
 
+def get_comments_page(request, post):
+    paginator = CursorPaginator(post.comments.select_related('author'),
+                                settings.COMMENTS_PER_PAGE, COMMENT_ORDERING)
+    return paginator.get_page(request.GET.get('after'))
 
+
+@condition(post_state)
 def post_detail(request, post_id):
-    posts = get_object_or_404(Post, pk=post_id)
-    comments = posts.comments.all()
+    posts = get_object_or_404(Post.objects.select_related('author', 'group'),
+                              pk=post_id)
+    comments = get_comments_page(request, posts)
     form = CommentForm()
-    return render(request, 'posts/post_detail.html', {'posts': posts,
-                                                      'form': form,
-                                                      'comments': comments})
+    posts_count = counters.get(counters.author_posts(posts.author_id))
+    return render(request, 'posts/post_detail.html',
+                  {'posts': posts,
+                   'form': form,
+                   'comments': comments,
+                   'posts_count': posts_count})
+
+
+def comments_more(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    return render(request, 'posts/includes/comments.html',
+                  {'posts': post,
+                   'comments': get_comments_page(request, post)})
 
 
 @login_required
+@throttle('post_create')
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
@@ -65,6 +117,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@throttle('add_comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -74,3 +127,40 @@ def add_comment(request, post_id):
         comment.post = post
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = SearchPaginator(query, settings.NUM_OF_POSTS)
+        page_obj = paginator.get_page(request.GET.get('after'),
+                                      request.GET.get('before'))
+    return render(request, 'posts/search.html',
+                  {'query': query,
+                   'query_string': urlencode({'q': query}) + '&',
+                   'page_obj': page_obj})
+
+
+@login_required
+def follow_index(request):
+    paginator = TimelinePaginator(request.user, settings.NUM_OF_POSTS)
+    page_obj = paginator.get_page(request.GET.get('after'),
+                                  request.GET.get('before'))
+    return render(request, 'posts/follow.html', {'page_obj': page_obj,
+                                                 'follow': True})
+
+
+@login_required
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    Follow.objects.filter(user=request.user, author=author).delete()
+    return redirect('posts:profile', username=username)
@@ -51,10 +51,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.auth.CachedAuthenticationMiddleware',
+    'core.db_router.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +89,10 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Тесты работают с кэшем во временном каталоге: manage.py test — через
+# TEST_RUNNER, pytest — через фикстуру tests/fixtures/fixture_cache.py.
+TEST_RUNNER = 'core.testing.TestRunner'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -94,6 +100,14 @@ DATABASES = {
     }
 }
 
+# Псевдонимы из DATABASES, с которых читают представления posts, например
+# 'replica': {'ENGINE': ..., 'NAME': os.path.join(BASE_DIR, 'replica.sqlite3')}.
+# Копии базы обновляет команда sync_replicas.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+# Сколько секунд после записи пользователь читает только с default.
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -135,6 +149,31 @@ STATIC_URL = '/static/'
 
 
 NUM_OF_POSTS = 10
+# 'page' — нумерованные страницы (?page=N), 'cursor' — курсорная пагинация
+# (?after=/?before=) без OFFSET и COUNT(*) для больших лент.
+PAGINATION_MODE = 'page'
+# Комментарии под постом подгружаются порциями по курсору.
+COMMENTS_PER_PAGE = 20
+# Постов на странице JSON API лент (posts.api).
+API_PAGE_SIZE = 20
+# Сколько номеров страниц показывать вокруг текущей и по краям списка.
+PAGINATOR_ON_EACH_SIDE = 3
+PAGINATOR_ON_ENDS = 2
+
+# Лента подписок: сколько постов хранить на пользователя и начиная
+# с какого числа подписчиков посты автора подмешиваются при чтении.
+TIMELINE_MAX_LENGTH = 800
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Сессии и пользователь запроса (core.auth) читаются из кэша; сессии
+# при этом пишутся и в базу. USER_CACHE_TIMEOUT — срок жизни записи
+# пользователя, секунды: сохранение пользователя сбрасывает её сразу.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+USER_CACHE_TIMEOUT = 15 * 60
+
+# Списки админки с фильтром считают строки не дальше этого числа
+# (posts.utils.EstimatedCountPaginator).
+ADMIN_COUNT_LIMIT = 10000
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -151,9 +190,106 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загрузки называются по хэшу содержимого (core.storage); миниатюры
+# sorl-thumbnail и так названы по исходнику и параметрам.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# За обратным прокси медиафайлы отдаёт он: например, 'X-Accel-Redirect'
+# с внутренним location nginx '/protected-media/' или 'X-Sendfile' с
+# MEDIA_ROOT + '/'. None — файлы отдаёт Django (core.views.media).
+MEDIA_ACCEL_HEADER = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Загрузки пишутся во временный файл, а не в память.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 
+# Картинки постов (posts.images): запрос отклоняет файлы больше
+# IMAGE_MAX_UPLOAD_SIZE байт и больше IMAGE_MAX_PIXELS пикселей, а фоновая
+# обработка поворачивает их по EXIF и уменьшает до IMAGE_MAX_SIDE по
+# большей стороне.
+IMAGE_MAX_UPLOAD_SIZE = 32 * 2 ** 20
+IMAGE_MAX_PIXELS = 50_000_000
+IMAGE_MAX_SIDE = 2560
+IMAGE_JPEG_QUALITY = 85
+
+# Миниатюры картинок постов строятся заранее в фоновом пуле потоков;
+# размеры и параметры должны совпадать с тегами {% thumbnail %} в шаблонах.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_WORKERS = 2
+POST_THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+    ('687x242', {'crop': 'center', 'upscale': True}),
+)
+
+# Полнотекстовый поиск по постам: posts.search.SQLiteFTS5Backend
+# или posts.search.IContainsBackend для баз без FTS5.
+SEARCH_BACKEND = 'posts.search.SQLiteFTS5Backend'
+
+# Бюджет SQL-запросов на представление; превышения пишутся в лог
+# core.query_budget вместе с отчётом о повторяющихся запросах.
+QUERY_BUDGET_DEFAULT = 15
+QUERY_BUDGETS = {
+    # Запись поста обновляет счётчики, ленту подписок и версии кэша.
+    'posts:post_create': 25,
+    'posts:post_edit': 25,
+    'posts:profile_follow': 30,
+    # Навигация по дням месяца — до 31 поиска по индексу даты
+    # (posts.templatetags.admin_dates).
+    'admin:posts_post_changelist': 45,
+    'admin:posts_comment_changelist': 45,
+}
+
+# Превышения бюджета запросов — одной строкой в консоль; полный отчёт с
+# группировкой запросов — на уровне DEBUG.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.query_budget': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Ограничение частоты записи (core.throttle): область -> корзины токенов
+# пользователя и IP-адреса в виде (ёмкость, токенов в секунду). Области
+# и корзины, которых здесь нет, не ограничиваются.
+THROTTLE_RATES = {
+    'post_create': {'user': (10, 1 / 60), 'ip': (30, 1 / 20)},
+    'add_comment': {'user': (20, 1 / 10), 'ip': (60, 1 / 3)},
+}
+# Если SQL-запросы одной записи шли дольше THROTTLE_WRITER_BUSY секунд
+# (ждали блокировку SQLite), все ограничиваемые записи отклоняются
+# THROTTLE_SHED_SECONDS секунд.
+THROTTLE_WRITER_BUSY = 1.0
+THROTTLE_SHED_SECONDS = 5
+
+# Срок жизни фрагментов лент, секунды. Свежесть обеспечивают версии лент
+# (posts.feed_cache), а не короткий TTL.
+FEED_CACHE_TIMEOUT = 300
+
+# Срок жизни отрисованных карточек постов (posts.cards), секунды. Правки
+# поста меняют ключ карточки; срок ограничивает только устаревание имени
+# автора и адреса группы.
+POST_CARD_TIMEOUT = 24 * 60 * 60
+
+# L1 в памяти каждого процесса поверх общего для всех процессов L2 в
+# файле SQLite; чужие записи вытесняются из L1 не позже SYNC_INTERVAL.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'L1_MAX_ENTRIES': 1000,
+            'SYNC_INTERVAL': 1.0,
+        },
     }
 }